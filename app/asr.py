@@ -2,81 +2,289 @@
 import os
 from io import BytesIO
 from typing import Dict, Any
-from openai import OpenAI, BadRequestError
-from tenacity import retry, stop_after_attempt, wait_fixed, RetryError
-import subprocess
+from openai import OpenAI, OpenAIError, BadRequestError
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_fixed
+import threading
+import wave
+
+import av
+import blake3
+import httpx
+import numpy as np
+import msgspec
+from cachetools import LRUCache
 
 _WHISPER_MODEL = os.getenv("ASR_MODEL", "whisper-1")
-_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 모든 청크가 하나의 TLS 세션/커넥션 풀을 재사용 (HTTP/2 멀티플렉싱)
+_client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.Client(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+    ),
+)
+
+# ASR 백엔드: "openai"(기본, Whisper API) | "faster-whisper"(프로세스 내 CTranslate2)
+_ASR_BACKEND = os.getenv("ASR_BACKEND", "openai").lower()
+_LOCAL_MODEL_NAME = os.getenv("WHISPER_MODEL", "small.en")  # 입력은 항상 영어 → 영어 전용 모델이 더 빠르고 정확
+_LOCAL_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "")  # 비우면 GPU=float16, CPU=int8
+
+# Silero VAD(ONNX, faster-whisper 번들) 게이트: 무음/잡음 청크는 ASR 호출 자체를 생략
+_VAD_ENABLED = os.getenv("ASR_VAD", "1") != "0"
+_VAD_THRESHOLD = float(os.getenv("ASR_VAD_THRESHOLD", "0.5"))
+
+_local_model = None
+_local_lock = threading.Lock()
+
+# 오디오 바이트의 BLAKE3 digest → 결과 (재전송/리플레이 청크는 Whisper 재호출 없이 반환)
+_CACHE: LRUCache = LRUCache(maxsize=int(os.getenv("ASR_CACHE_SIZE", "1024")))
+_cache_lock = threading.Lock()
 
-def _bytesio_named(b: bytes, name: str) -> BytesIO:
-    bio = BytesIO(b)
-    bio.name = name  # 파일 확장자로 포맷 추론에 매우 중요
-    return bio
+# verbose_json 응답 스키마 (필요한 필드만, 나머지는 무시)
+class _Seg(msgspec.Struct):
+    start: float = 0.0
+    end: float = 0.0
+    text: str = ""
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(0.4))
-def _whisper_call(model: str, fileobj: BytesIO):
-    return _client.audio.transcriptions.create(
+class _Word(msgspec.Struct):
+    start: float = 0.0
+    end: float = 0.0
+    word: str = ""
+
+class _VerboseResp(msgspec.Struct):
+    text: str = ""
+    segments: list[_Seg] = []
+    words: list[_Word] = []  # timestamp_granularities=["word", ...] 요청 시에만 채워짐
+
+_VERBOSE_DEC = msgspec.json.Decoder(_VerboseResp)
+
+_MIME_BY_EXT = {
+    ".webm": "audio/webm", ".ogg": "audio/ogg", ".wav": "audio/wav",
+    ".mp4": "audio/mp4", ".m4a": "audio/mp4", ".mp3": "audio/mpeg", ".flac": "audio/flac",
+}
+
+# 4xx(포맷 오류 등)는 재시도해도 같은 결과 → 즉시 실패시켜 WAV 폴백으로 넘김
+@retry(
+    stop=stop_after_attempt(3), wait=wait_fixed(0.4),
+    retry=retry_if_not_exception_type(BadRequestError), reraise=True,
+)
+def _whisper_call(model: str, data: bytes, filename: str, **kwargs) -> bytes:
+    # (filename, bytes, mime) 튜플로 넘기면 SDK가 BytesIO 래핑/복사 없이 그대로 전송하고,
+    # 재시도마다 스트림 위치(seek)를 신경 쓸 필요도 없음. 확장자로 포맷 추론에 매우 중요
+    mime = _MIME_BY_EXT.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+    # SDK의 pydantic 모델을 거치지 않고 raw JSON 본문만 받아 msgspec으로 직접 디코드
+    raw = _client.audio.transcriptions.with_raw_response.create(
         model=model,
-        file=fileobj,
+        file=(filename, data, mime),
         response_format="verbose_json",
+        **kwargs,
     )
+    return raw.content
+
+def _decode_pcm16k(src_bytes: bytes) -> np.ndarray:
+    """
+    webm/ogg/wav 등 컨테이너를 PyAV(libavcodec/libswresample, 프로세스 내)로
+    16kHz mono float32 ndarray로 디코드. ffmpeg 프로세스 fork/exec 및 파이프 복사 없음.
+    """
+    chunks = []
+    try:
+        with av.open(BytesIO(src_bytes)) as container:
+            stream = container.streams.audio[0]
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+            for frame in container.decode(stream):
+                for f in resampler.resample(frame):
+                    chunks.append(f.to_ndarray())
+            for f in resampler.resample(None):  # 리샘플러 잔여 버퍼 flush
+                chunks.append(f.to_ndarray())
+    except Exception as e:
+        raise ValueError(f"audio decode failed: {e}")
+    if not chunks:
+        raise ValueError("audio decode failed: no audio frames")
+    return np.concatenate(chunks, axis=1).reshape(-1).astype(np.float32) / 32768.0
+
+def load_samples(audio_bytes: bytes, filename: str) -> np.ndarray:
+    """
+    filename 확장자가 .pcm이면 브라우저/클라이언트가 보낸 raw PCM16(16kHz mono, LE)로 간주 → 디코드 생략
+    그 외에는 컨테이너(webm/ogg/wav...)로 보고 PyAV 디코드
+    """
+    if filename.endswith(".pcm"):
+        n = len(audio_bytes) // 2 * 2
+        return np.frombuffer(audio_bytes[:n], dtype="<i2").astype(np.float32) / 32768.0
+    return _decode_pcm16k(audio_bytes)
 
-def _to_wav_ffmpeg(src_bytes: bytes) -> bytes:
+def _normalize(x: np.ndarray) -> np.ndarray:
     """
-    webm/ogg 등 문제있는 컨테이너를 FFmpeg로 WAV(16kHz/mono)로 변환.
-    FFmpeg가 설치되어 있어야 함 (macOS: `brew install ffmpeg`).
+    RMS 기준 -20 dBFS 쪽으로 ±3 dB 이내 게인 보정 후, 피크가 1을 넘으면 [-1, 1]로 스케일.
+    전부 NumPy 벡터 연산. 사실상 무음(rms < 1e-4)은 그대로 둔다.
     """
-    cmd = [
-        "ffmpeg",
-        "-hide_banner", "-loglevel", "error",
-        "-y", "-i", "pipe:0",
-        "-f", "wav", "-ac", "1", "-ar", "16000",
-        "pipe:1",
-    ]
-    proc = subprocess.run(cmd, input=src_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if proc.returncode != 0 or not proc.stdout:
-        err = proc.stderr.decode(errors="ignore") if proc.stderr else "unknown"
-        raise ValueError(f"ffmpeg transcode failed: {err}")
-    return proc.stdout
-
-def _transcribe_or_raise(b: bytes, filename: str) -> Dict[str, Any]:
+    rms = float(np.sqrt(np.mean(x * x) + 1e-12))
+    if rms < 1e-4:
+        return x
+    g = np.clip(-20.0 - 20.0 * np.log10(rms), -3.0, 3.0)
+    y = x * np.float32(10.0 ** (g / 20.0))
+    peak = float(np.max(np.abs(y)))
+    return y / max(1.0, peak)
+
+def _to_wav(samples: np.ndarray, rate: int = 16000) -> bytes:
+    """float32 [-1, 1] mono 샘플 → PCM16 WAV 바이트 (메모리 내)"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def _transcribe_or_raise(b: bytes, filename: str, **kwargs) -> Dict[str, Any]:
     try:
-        resp = _whisper_call(_WHISPER_MODEL, _bytesio_named(b, filename))
-    except (BadRequestError, RetryError) as e:
-        # RetryError 래핑을 풀어 메시지 확보
-        msg = ""
-        if isinstance(e, RetryError):
-            last = e.last_attempt.exception() if hasattr(e, "last_attempt") else None
-            msg = getattr(last, "message", str(last)) if last else str(e)
-        else:
-            msg = getattr(e, "message", str(e))
+        resp = _whisper_call(_WHISPER_MODEL, b, filename, **kwargs)
+    except OpenAIError as e:
+        msg = getattr(e, "message", str(e))
         raise ValueError(f"primary transcribe failed: {msg}")
 
-    out: Dict[str, Any] = {"text": getattr(resp, "text", "") or "", "segments": []}
-    for s in getattr(resp, "segments", []) or []:
-        out["segments"].append({
-            "start": float(getattr(s, "start", 0.0) or 0.0),
-            "end": float(getattr(s, "end", 0.0) or 0.0),
-            "text": getattr(s, "text", "") or "",
-        })
+    try:
+        parsed = _VERBOSE_DEC.decode(resp)
+    except msgspec.DecodeError as e:
+        raise ValueError(f"primary transcribe failed: bad response body: {e}")
+    return {
+        "text": parsed.text,
+        "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in parsed.segments],
+        "words": [{"start": w.start, "end": w.end, "word": w.word} for w in parsed.words],
+    }
+
+def _get_local_model():
+    """faster-whisper 모델은 무거우므로 첫 사용 시 1회만 로드 (프로세스 싱글톤)"""
+    global _local_model
+    if _local_model is None:
+        with _local_lock:
+            if _local_model is None:
+                import ctranslate2
+                from faster_whisper import WhisperModel
+                device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+                compute_type = _LOCAL_COMPUTE_TYPE or ("float16" if device == "cuda" else "int8")
+                _local_model = WhisperModel(_LOCAL_MODEL_NAME, device=device, compute_type=compute_type)
+    return _local_model
+
+def _has_speech(samples: np.ndarray) -> bool:
+    """16kHz float32 샘플에 threshold 이상인 음성 구간이 하나라도 있으면 True"""
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+    except ImportError:
+        return True  # VAD 불가 → 게이트 통과
+    return bool(get_speech_timestamps(samples, VadOptions(threshold=_VAD_THRESHOLD)))
+
+def has_speech(samples: np.ndarray) -> bool:
+    """호출자용 VAD 게이트 (ASR_VAD=0이면 항상 True)"""
+    return not _VAD_ENABLED or _has_speech(samples)
+
+def _transcribe_local(samples: np.ndarray) -> Dict[str, Any]:
+    # WAV 재인코딩 없이 ndarray를 그대로 모델에 전달 (vad_filter로 음성 구간만 디코드)
+    segments, _ = _get_local_model().transcribe(samples, beam_size=1, vad_filter=True)
+    out: Dict[str, Any] = {"text": "", "segments": []}
+    parts = []
+    for s in segments:  # generator → 여기서 실제 디코딩 수행
+        parts.append(s.text)
+        out["segments"].append({"start": float(s.start), "end": float(s.end), "text": s.text})
+    out["text"] = "".join(parts).strip()
     return out
 
+def warmup():
+    """
+    서버 startup에서 1회 호출: 첫 청크가 콜드 스타트 비용을 떠안지 않도록
+    - faster-whisper: 모델 로드 + 1초 무음으로 1회 추론 (VAD 게이트 우회, 커널 초기화)
+    - OpenAI: 과금 없는 models.retrieve로 커넥션 풀에 TLS 세션을 미리 맺어 둠
+    """
+    if _ASR_BACKEND == "faster-whisper":
+        segments, _ = _get_local_model().transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+        list(segments)
+    else:
+        _client.with_options(timeout=5.0, max_retries=0).models.retrieve(_WHISPER_MODEL)
+
+def transcribe_samples(samples: np.ndarray, *, prompt: str = "") -> Dict[str, Any]:
+    """
+    롤링 버퍼용: 16kHz float32 버퍼 전체를 단어 타임스탬프와 함께 전사 (캐시 없음).
+    prompt: 버퍼 밖으로 밀려난 직전 확정 텍스트 (문맥 유지)
+    """
+    out: Dict[str, Any] = {"text": "", "segments": [], "words": []}
+    if samples.size == 0 or (_VAD_ENABLED and not _has_speech(samples)):
+        return out
+    samples = _normalize(samples)
+
+    if _ASR_BACKEND == "faster-whisper":
+        segments, _ = _get_local_model().transcribe(
+            samples, beam_size=1, vad_filter=True,
+            word_timestamps=True, initial_prompt=prompt or None,
+        )
+        parts = []
+        for s in segments:
+            parts.append(s.text)
+            out["segments"].append({"start": float(s.start), "end": float(s.end), "text": s.text})
+            for w in s.words or []:
+                out["words"].append({"start": float(w.start), "end": float(w.end), "word": w.word})
+        out["text"] = "".join(parts).strip()
+        return out
+
+    kwargs: Dict[str, Any] = {"timestamp_granularities": ["word", "segment"]}
+    if prompt:
+        kwargs["prompt"] = prompt
+    return _transcribe_or_raise(_to_wav(samples), "chunk.wav", **kwargs)
+
 def transcribe_chunk(audio_bytes: bytes, *, filename: str = "chunk.webm") -> Dict[str, Any]:
+    """동일 오디오 바이트는 캐시된 결과 반환 (성공한 결과만 캐시)"""
+    key = blake3.blake3(audio_bytes).digest()
+    with _cache_lock:
+        hit = _CACHE.get(key)
+    if hit is not None:
+        return hit
+    out = _transcribe_uncached(audio_bytes, filename)
+    with _cache_lock:
+        _CACHE[key] = out
+    return out
+
+def _transcribe_uncached(audio_bytes: bytes, filename: str) -> Dict[str, Any]:
     """
-    1차: 업로드 포맷 그대로 전송 (BytesIO.name=filename)
-    2차: 실패 시 ffmpeg로 WAV 변환해서 재시도
+    filename이 *.pcm이면 raw PCM16(16kHz mono)로 취급 (컨테이너 디코드 생략)
+    VAD: 음성이 없으면 ASR 호출 없이 빈 결과 반환
+    faster-whisper 백엔드: 프로세스 내에서 바로 디코드+추론
+    OpenAI 백엔드:
+      PCM: WAV 헤더만 씌워 1회 전송
+      1차: 업로드 포맷 그대로 전송 (filename 확장자로 포맷 추론)
+      2차: 실패 시 PyAV로 디코드 → WAV 변환해서 재시도
     """
     if not audio_bytes or len(audio_bytes) < 100:
         raise ValueError("Empty or too-small audio chunk")
 
+    is_pcm = filename.endswith(".pcm")
+    samples = None
+    if _VAD_ENABLED or is_pcm or _ASR_BACKEND == "faster-whisper":
+        try:
+            samples = load_samples(audio_bytes, filename)
+        except ValueError:
+            if is_pcm or _ASR_BACKEND == "faster-whisper":
+                raise
+            # 디코드 실패한 컨테이너는 VAD 없이 API에 그대로 맡김 (아래 1차/2차 경로)
+
+    if _VAD_ENABLED and samples is not None and not _has_speech(samples):
+        return {"text": "", "segments": []}
+    if samples is not None:
+        samples = _normalize(samples)
+
+    if _ASR_BACKEND == "faster-whisper":
+        return _transcribe_local(samples)
+
+    if is_pcm:
+        # API는 raw PCM을 받지 않으므로 WAV로 감싸서 전송 (legacy API 경로)
+        return _transcribe_or_raise(_to_wav(samples), "chunk.wav")
+
     # 1차 시도 (원본 webm/ogg/wav 등)
     try:
         return _transcribe_or_raise(audio_bytes, filename)
     except ValueError as first_err:
-        # 2차: FFmpeg로 WAV 변환 후 재시도
+        # 2차: PyAV로 디코드 → WAV 변환 후 재시도
         try:
-            wav = _to_wav_ffmpeg(audio_bytes)
+            wav = _to_wav(samples if samples is not None else _decode_pcm16k(audio_bytes))
             return _transcribe_or_raise(wav, "chunk.wav")
         except Exception as second_err:
             raise ValueError(
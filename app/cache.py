@@ -0,0 +1,97 @@
+# app/cache.py
+# 번역 결과 캐시 ("Thank you.", "Let's get started." 같은 반복 문장은 LLM 호출 없이 응답)
+# - 1단계: 프로세스 내 LRU
+# - 2단계: REDIS_URL이 있으면 Redis(인스턴스 간 공유, TTL)
+# - 3단계: data/translate_cache/ SQLite (재시작 후에도 유지)
+# - LRU/Redis는 이벤트 루프에서만 접근하므로 락 불필요, SQLite 읽기/쓰기는 모두 스레드에서
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+from cachetools import LRUCache
+
+from app.translate import CACHE_NAMESPACE
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis 미설치 → 로컬 LRU만
+    aioredis = None
+
+_PREFIX = b"tr:v1:"  # 키 형식 변경 시 버전을 올려 기존 캐시 무효화
+_TTL_SEC = int(os.getenv("TRANSLATE_CACHE_TTL", str(14 * 24 * 3600)))
+_REDIS_URL = os.getenv("REDIS_URL")
+
+_LOCAL: LRUCache = LRUCache(maxsize=int(os.getenv("TRANSLATE_CACHE_SIZE", "4096")))
+_redis = aioredis.from_url(_REDIS_URL) if aioredis is not None and _REDIS_URL else None
+
+def _open_db() -> Optional[sqlite3.Connection]:
+    if os.getenv("TRANSLATE_DISK_CACHE", "1") == "0":
+        return None
+    path = Path("data") / "translate_cache"
+    path.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path / "cache.sqlite3", check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("CREATE TABLE IF NOT EXISTS tr (k BLOB PRIMARY KEY, v TEXT NOT NULL)")
+    return db
+
+_db = _open_db()
+_db_lock = threading.Lock()
+
+def text_hash(text: str) -> bytes:
+    # 공백/대소문자 정규화 후 모델+프롬프트와 함께 해시 (API에는 원문 그대로 전송)
+    norm = " ".join(text.split()).lower()
+    return hashlib.sha256(f"{CACHE_NAMESPACE}\0{norm}".encode()).digest()
+
+def _key(h: bytes, lang: str) -> bytes:
+    return _PREFIX + h + b":" + lang.encode()
+
+def _db_get(key: bytes) -> Optional[str]:
+    # PK 조회 1회. 같은 락을 쓰기(_db_set)가 잡고 있을 수 있으므로 루프가 아닌 스레드에서 호출
+    with _db_lock:
+        row = _db.execute("SELECT v FROM tr WHERE k = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _db_set(key: bytes, val: str):
+    with _db_lock:
+        _db.execute("INSERT OR REPLACE INTO tr (k, v) VALUES (?, ?)", (key, val))
+
+async def get_cached(h: bytes, lang: str) -> Optional[str]:
+    key = _key(h, lang)
+    val = _LOCAL.get(key)
+    if val is not None:
+        return val
+    if _redis is not None:
+        try:
+            raw = await _redis.get(key)
+        except Exception as e:
+            print(f"[DEBUG] Redis get failed: {e}")
+            raw = None
+        if raw is not None:
+            val = raw.decode()
+    if val is None and _db is not None:
+        try:
+            val = await asyncio.to_thread(_db_get, key)
+        except Exception as e:
+            print(f"[DEBUG] Translate cache read failed: {e}")
+    if val is not None:
+        _LOCAL[key] = val
+    return val
+
+async def set_cached(h: bytes, lang: str, val: str):
+    key = _key(h, lang)
+    _LOCAL[key] = val
+    if _redis is not None:
+        try:
+            await _redis.set(key, val.encode(), ex=_TTL_SEC)
+        except Exception as e:
+            print(f"[DEBUG] Redis set failed: {e}")
+    if _db is not None:
+        try:
+            await asyncio.to_thread(_db_set, key, val)  # write-through (디스크 쓰기는 루프 밖에서)
+        except Exception as e:
+            print(f"[DEBUG] Translate cache write failed: {e}")
@@ -1,22 +1,110 @@
 # app/exporters.py
 from docx import Document
+from docx.oxml.ns import qn
 from docx.shared import Pt
 from io import BytesIO
+from cachetools import LRUCache
+from lxml import etree
+import os
+import threading
 
-def build_docx(entries):
-    doc = Document()
+def _configure_style(doc):
     style = doc.styles['Normal']
     style.font.name = 'Arial'
     style.font.size = Pt(11)
 
+def _build_template() -> bytes:
+    # 스타일 변경(lxml 속성 쓰기)/헤딩은 import 시 1회만 → 요청마다 bytes에서 다시 로드만
+    doc = Document()
+    _configure_style(doc)
     doc.add_heading("Live Caption Transcript", level=1)
-    for i, e in enumerate(entries, 1):
-        doc.add_paragraph(f"[{i}] ({e['t0']:.2f}–{e['t1']:.2f}s)")
-        doc.add_paragraph(f"EN: {e['text_en']}")
-        if e["text_ko"]:
-            doc.add_paragraph(f"KO: {e['text_ko']}")
-        doc.add_paragraph("")  # spacing
     buf = BytesIO()
     doc.save(buf)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
+
+_TEMPLATE_BYTES = _build_template()
+
+_W_P, _W_R, _W_T, _W_BR = qn("w:p"), qn("w:r"), qn("w:t"), qn("w:br")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+def _append_p(body, text: str):
+    # add_paragraph 대신 <w:p><w:r><w:t> 를 lxml로 직접 생성 (줄바꿈은 <w:br/>)
+    p = etree.SubElement(body, _W_P)
+    if not text:
+        return
+    r = etree.SubElement(p, _W_R)
+    for j, line in enumerate(text.split("\n")):
+        if j:
+            etree.SubElement(r, _W_BR)
+        t = etree.SubElement(r, _W_T)
+        t.text = line
+        t.set(_XML_SPACE, "preserve")
+
+def build_docx_into(cols, f):
+    """cols: SESSION.get()이 돌려주는 column-major 데이터 (t0/t1/text_en/text_ko). f: 쓰기 가능한 바이너리 스트림"""
+    doc = Document(BytesIO(_TEMPLATE_BYTES))
+    body = doc.element.body
+    # sectPr는 body의 마지막 자식이어야 하므로 잠시 떼었다가 마지막에 다시 붙임
+    sect = body.sectPr
+    if sect is not None:
+        body.remove(sect)
+
+    t0, t1, en, ko = cols["t0"], cols["t1"], cols["text_en"], cols["text_ko"]
+    for i in range(len(en)):
+        _append_p(body, f"[{i + 1}] ({t0[i]:.2f}–{t1[i]:.2f}s)")
+        _append_p(body, f"EN: {en[i]}")
+        if ko[i]:
+            _append_p(body, f"KO: {ko[i]}")
+        _append_p(body, "")  # spacing
+
+    if sect is not None:
+        body.append(sect)
+    doc.save(f)
+
+def iter_docx(cols, chunk_size: int = 65536):
+    """
+    워커 스레드가 pipe에 docx(zip)를 쓰는 동안 읽는 즉시 yield.
+    전체 문서를 메모리에 올리지 않고 첫 바이트를 빨리 보냄 (zipfile은 비-seekable 스트림 지원)
+    """
+    r, w = os.pipe()
+
+    def _worker():
+        try:
+            with os.fdopen(w, "wb") as f:
+                build_docx_into(cols, f)
+        except Exception as e:  # 클라이언트가 끊으면 BrokenPipe
+            print(f"[DEBUG] DOCX stream aborted: {e}")
+
+    threading.Thread(target=_worker, daemon=True).start()
+    with os.fdopen(r, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+# 완료된 세션을 다시 내보낼 때 재생성하지 않도록 session_id → ((항목 수, 마지막 t1), docx bytes)
+# 세션당 1개만 유지: 항목이 늘면 버전이 바뀌어 다음 export가 덮어씀. 전체 크기는 바이트 기준 상한
+# 스트리밍 제너레이터는 스레드풀에서 돌므로 락 필요
+_DOCX_CACHE_BYTES = 32 * 1024 * 1024
+_DOCX_CACHE: LRUCache = LRUCache(maxsize=_DOCX_CACHE_BYTES, getsizeof=lambda v: len(v[1]))
+_docx_cache_lock = threading.Lock()
+
+def iter_docx_cached(session_id: str, cols, chunk_size: int = 65536):
+    n = len(cols["text_en"])
+    version = (n, cols["t1"][-1] if n else 0.0)
+    with _docx_cache_lock:
+        hit = _DOCX_CACHE.get(session_id)
+    if hit is not None and hit[0] == version:
+        yield hit[1]
+        return
+    parts, size = [], 0
+    for chunk in iter_docx(cols, chunk_size):
+        if parts is not None:
+            size += len(chunk)
+            if size <= _DOCX_CACHE_BYTES:
+                parts.append(chunk)
+            else:
+                parts = None  # 상한보다 큰 문서는 모으지 않음 (스트리밍 메모리 절약 유지, LRUCache도 거부함)
+        yield chunk
+    # 끝까지 스트리밍된 경우에만 저장 (중간에 끊기면 제너레이터가 여기까지 오지 않음)
+    if parts is not None:
+        with _docx_cache_lock:
+            _DOCX_CACHE[session_id] = (version, b"".join(parts))
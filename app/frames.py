@@ -0,0 +1,63 @@
+# app/frames.py
+# WebSocket 바이너리 프레임 (proto=bin)
+# [type u8][seq u32][t0 f32][t1 f32][len u32][utf-8 text]  (+ ko_batch: [len u32][utf-8 ko])
+# 프레임이 자체 길이를 가지므로 여러 메시지를 이어붙여 한 번에 전송 가능
+import struct
+from typing import Any, Dict, List
+
+_HDR = struct.Struct("<BIffI")
+_LEN = struct.Struct("<I")
+
+TYPE_PARTIAL, TYPE_FINAL, TYPE_KO_BATCH, TYPE_ERROR = 1, 2, 3, 4
+_NAME_BY_TYPE = {TYPE_PARTIAL: "en_partial", TYPE_FINAL: "en_final", TYPE_KO_BATCH: "ko_batch", TYPE_ERROR: "error"}
+
+def _pack(msg_type: int, seq: int, t0: float, t1: float, text: str) -> bytes:
+    b = text.encode()
+    return _HDR.pack(msg_type, seq, t0, t1, len(b)) + b
+
+def pack_partial(seq: int, t0: float, t1: float, text: str) -> bytes:
+    return _pack(TYPE_PARTIAL, seq, t0, t1, text)
+
+def pack_final(seq: int, t0: float, t1: float, text: str) -> bytes:
+    return _pack(TYPE_FINAL, seq, t0, t1, text)
+
+def pack_ko_batch(t0: float, t1: float, text_en: str, text_ko: str) -> bytes:
+    ko = text_ko.encode()
+    return _pack(TYPE_KO_BATCH, 0, t0, t1, text_en) + _LEN.pack(len(ko)) + ko
+
+def pack_error(message: str) -> bytes:
+    return _pack(TYPE_ERROR, 0, 0.0, 0.0, message)
+
+def pack_msg(msg: Dict[str, Any]) -> bytes:
+    """ws_stream의 JSON 메시지(dict)를 같은 의미의 바이너리 프레임으로"""
+    t = msg["type"]
+    if t == "ko_batch":
+        w = msg["window"]
+        return pack_ko_batch(w["t0"], w["t1"], msg["text_en"], msg["text_ko"])
+    if t == "error":
+        return pack_error(msg["message"])
+    if t == "en_final":
+        return pack_final(msg["seq"], msg["t0"], msg["t1"], msg["text_en"])
+    return pack_partial(msg["seq"], msg["t0"], msg["t1"], msg["text_en"])
+
+def unpack_frames(buf: bytes) -> List[Dict[str, Any]]:
+    """이어붙은 프레임을 JSON 메시지와 같은 모양의 dict 목록으로 (테스트 클라이언트용)"""
+    out: List[Dict[str, Any]] = []
+    pos = 0
+    while pos < len(buf):
+        msg_type, seq, t0, t1, n = _HDR.unpack_from(buf, pos)
+        pos += _HDR.size
+        text = buf[pos:pos + n].decode()
+        pos += n
+        name = _NAME_BY_TYPE[msg_type]
+        if msg_type == TYPE_KO_BATCH:
+            (n,) = _LEN.unpack_from(buf, pos)
+            pos += _LEN.size
+            ko = buf[pos:pos + n].decode()
+            pos += n
+            out.append({"type": name, "window": {"t0": round(t0, 2), "t1": round(t1, 2)}, "text_en": text, "text_ko": ko})
+        elif msg_type == TYPE_ERROR:
+            out.append({"type": name, "message": text})
+        else:
+            out.append({"type": name, "seq": seq, "t0": round(t0, 2), "t1": round(t1, 2), "text_en": text})
+    return out
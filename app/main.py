@@ -6,14 +6,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import re
+import time
 from pathlib import Path
-from datetime import datetime
 import uuid
-import shutil
-from io import BytesIO
 import asyncio
-import json
+from dataclasses import dataclass, field
+from collections import deque
+from itertools import count, islice
+
+import orjson
 
 # 환경변수 검증
 required_env_vars = ["OPENAI_API_KEY"]
@@ -25,10 +26,16 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, UploadFile,
 from fastapi.responses import PlainTextResponse, StreamingResponse, HTMLResponse, FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.asr import transcribe_chunk
-from app.translate import translate_text
+from app.asr import transcribe_chunk, transcribe_samples, load_samples, has_speech
+from app import asr
+from app import translate_batcher
+from app import pools
+from app.pools import ASR_POOL, run_in
+from app import translate
 from app.session import SESSION
-from app.exporters import build_docx
+from app.exporters import iter_docx_cached
+from app.frames import pack_msg
+from app.streaming import RollingTranscriber, words_to_text
 
 # ─────────────────────────────────────────────────────────────
 # FastAPI
@@ -64,23 +71,63 @@ app.add_middleware(
 # ─────────────────────────────────────────────────────────────
 # 유틸
 # ─────────────────────────────────────────────────────────────
+_ENDPUNCT = ".!?"  # clean_en / CaptionBuffer 공용 (마지막 글자 멤버십 검사)
+
 def clean_en(s: str) -> str:
     if not s:
         return s
-    s = re.sub(r"\s+", " ", s).strip()
-    s = re.sub(r"\.{3,}$", ".", s)
-    if len(s) > 40 and not re.search(r"[.!?]$", s):
+    # 공백 정규화는 str.split/join(C 구현)이 re.sub(r"\s+")보다 빠름
+    s = " ".join(s.split())
+    if s.endswith("..."):
+        # 말줄임(3개 이상의 마침표)을 마침표 1개로 (re.sub(r"\.{3,}$") 대신 문자열 메서드)
+        s = s.rstrip(".") + "."
+    if len(s) > 40 and s[-1] not in _ENDPUNCT:  # len > 40 이므로 s[-1] 안전
         s += "."
     return s
 
-def r2(x: float) -> float:
-    return float(f"{x:.2f}")
+_CHUNK_SEQ = count()  # 프로세스 단조 카운터 (세션 디렉터리는 프로세스마다 새 uuid라 재시작 후에도 충돌 없음)
+
+def _chunk_id() -> str:
+    # 청크 파일명: 시계 해상도(Windows ~15ms)와 무관하게 충돌 없음 + 이름순 = 도착순
+    return f"{next(_CHUNK_SEQ):012d}"
+
+_TS_CACHE = (0, "")  # (epoch 초, "%Y%m%d_%H%M%S") → 같은 초 안에서는 strftime 생략
+
+def _export_ts() -> str:
+    global _TS_CACHE
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE = (now, time.strftime("%Y%m%d_%H%M%S", time.localtime(now)))
+    return _TS_CACHE[1]
+
+# WS/SSE 공용 직렬화 옵션 (numpy 스칼라/배열, 숫자 키 dict도 그대로 직렬화)
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def dumps_json(obj) -> bytes:
+    # Starlette send_json(stdlib json) 대신 orjson → 바로 utf-8 bytes
+    return orjson.dumps(obj, option=_ORJSON_OPTS)
 
 DATA_DIR = Path("data")
 (DATA_DIR / "sessions").mkdir(parents=True, exist_ok=True)
 (DATA_DIR / "exports").mkdir(parents=True, exist_ok=True)
 
-SESSION_TIMELINE = {}  # session_id -> float (HTTP 청크용 글로벌 타임라인)
+_BG_TASKS: set[asyncio.Task] = set()  # fire-and-forget 태스크 참조 유지 (GC로 중간에 사라지지 않도록)
+
+def spawn_bg(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    return task
+
+# HTTP 청크는 202로 바로 응답하고 세션별 큐 + 워커 1개가 도착 순서대로 처리(큐 순서 = 타임라인 순서)
+# 결과는 SSE로만 전달. 대기열은 상한까지만
+CHUNK_MAX_PENDING = int(os.getenv("CHUNK_MAX_PENDING", "4"))
+SAVE_CHUNKS = os.getenv("SAVE_CHUNKS", "1") != "0"  # 0이면 업로드 청크를 디스크에 보관하지 않음
+
+def _rolling_feed(rt: RollingTranscriber, audio_bytes: bytes, filename: str):
+    # 디코드 + 버퍼 전체 재전사 (블로킹 → ASR 풀에서). 무음 청크는 VAD로 걸러 재전사 생략
+    samples = load_samples(audio_bytes, filename)
+    return rt.feed(samples, speech=has_speech(samples))
 
 # ─────────────────────────────────────────────────────────────
 # 최소–최대 윈도우 버퍼
@@ -98,6 +145,9 @@ class CaptionBuffer:
         self.t0 = None
         self.t1 = None
         self.accum_sec = 0.0
+        # ready() 판정용 누적값: 매 add마다 join하지 않고 O(1)로 확인
+        self._char_count = 0  # " ".join(en_parts)의 길이
+        self._last_char = ""  # 마지막 비어있지 않은 조각의 끝 글자
 
     def add(self, seg_t0: float, seg_t1: float, text_en: str):
         if not text_en:
@@ -106,27 +156,26 @@ class CaptionBuffer:
             self.t0 = seg_t0
         self.t1 = seg_t1
         self.accum_sec += max(0.0, (seg_t1 or 0.0) - (seg_t0 or 0.0))
-        self.en_parts.append(text_en.strip())
+        t = text_en.strip()
+        if t:  # 빈 조각은 넣지 않음 → join 결과 길이 == _char_count, strip 불필요
+            self.en_parts.append(t)
+            self._char_count += len(t) + (1 if self._char_count else 0)
+            self._last_char = t[-1]
 
     def _joined_en(self) -> str:
-        return " ".join(self.en_parts).strip()
-
-    def _ends_with_punct(self, s: str) -> bool:
-        return s.endswith((".", "?", "!"))
+        return " ".join(self.en_parts)
 
     def ready(self) -> bool:
-        en = self._joined_en()
-        if len(en) < self.min_chars:
+        # 정수/글자 비교만 (join은 flush에서 1회)
+        if self._char_count < self.min_chars:
             return False
         if self.accum_sec >= self.max_window:
             return True
-        if self.accum_sec >= self.min_window and self._ends_with_punct(en):
-            return True
-        return False
+        return self.accum_sec >= self.min_window and self._last_char in _ENDPUNCT
 
     def flush(self):
         en = self._joined_en()
-        if en and not self._ends_with_punct(en) and len(en) > 40:
+        if self._char_count > 40 and self._last_char not in _ENDPUNCT:
             en += "."
         seg = (self.t0 or 0.0, self.t1 or 0.0)
         self.reset()
@@ -135,49 +184,175 @@ class CaptionBuffer:
 # ─────────────────────────────────────────────────────────────
 # SSE 브로커 & 버퍼 캐시 (세션별)
 # ─────────────────────────────────────────────────────────────
+_SSE_HEADERS: dict[str, bytes] = {}  # event_type -> b"event: <type>\nid: "
+_SSE_PING = b"event: ping\ndata: {}\n\n"
+_SSE_KEEPALIVE = b": keep-alive\n\n"
+SSE_BACKLOG = 256  # 세션별로 보관하는 최근 프레임 수 (느린 구독자가 따라잡을 수 있는 범위)
+
+class _Channel:
+    """세션별 공유 링 버퍼: 모든 구독자가 같은 deque를 각자의 위치(pos)에서 읽음"""
+    __slots__ = ("frames", "total", "event", "subs")
+
+    def __init__(self):
+        self.frames: deque[bytes] = deque(maxlen=SSE_BACKLOG)
+        self.total = 0  # 지금까지 publish된 프레임 수 (절대 위치)
+        self.event = asyncio.Event()  # publish마다 교체되는 세대(generation) 이벤트
+        self.subs = 0
+
+    def since(self, pos: int) -> tuple[bytes, int]:
+        # pos 이후 프레임을 한 덩어리로 (너무 뒤처져 링에서 밀려난 프레임은 건너뜀)
+        skip = max(0, pos - (self.total - len(self.frames)))
+        return b"".join(islice(self.frames, skip, None)), self.total
+
 class EventBroker:
     def __init__(self):
-        self._subs: dict[str, set[asyncio.Queue]] = {}
-        self._lock = asyncio.Lock()
+        self._chans: dict[str, _Channel] = {}
+        self._lock = asyncio.Lock()  # subscribe/unsubscribe 전용 (publish는 락 없이 O(1))
         self._msg_id = 0
 
-    async def subscribe(self, session_id: str) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue()
+    async def subscribe(self, session_id: str) -> _Channel:
         async with self._lock:
-            self._subs.setdefault(session_id, set()).add(q)
-        return q
+            ch = self._chans.get(session_id)
+            if ch is None:
+                ch = self._chans[session_id] = _Channel()
+            ch.subs += 1
+        return ch
 
-    async def unsubscribe(self, session_id: str, q: asyncio.Queue):
+    async def unsubscribe(self, session_id: str, ch: _Channel):
         async with self._lock:
-            if session_id in self._subs:
-                self._subs[session_id].discard(q)
-                if not self._subs[session_id]:
-                    del self._subs[session_id]
+            ch.subs -= 1
+            if ch.subs <= 0 and self._chans.get(session_id) is ch:
+                del self._chans[session_id]
 
     async def publish(self, session_id: str, event_type: str, data: dict):
-        async with self._lock:
-            qs = list(self._subs.get(session_id, []))
-            self._msg_id += 1
-            msg = {"type": event_type, "data": data, "id": self._msg_id}
-        for q in qs:
-            try:
-                q.put_nowait(msg)
-            except Exception:
-                pass
+        ch = self._chans.get(session_id)
+        if ch is None:
+            return  # 구독자 없음
+        self._msg_id += 1
+        # SSE 프레임을 1회만 인코딩 → 모든 구독자가 같은 bytes를 공유 (구독자별 재직렬화 없음)
+        hdr = _SSE_HEADERS.get(event_type)
+        if hdr is None:
+            hdr = _SSE_HEADERS[event_type] = f"event: {event_type}\nid: ".encode()
+        ch.frames.append(b"%s%d\ndata: %s\n\n" % (hdr, self._msg_id, dumps_json(data)))
+        ch.total += 1
+        # 대기 중인 구독자를 모두 깨우고 다음 세대 이벤트로 교체 (clear 경합 없음)
+        ev, ch.event = ch.event, asyncio.Event()
+        ev.set()
 
 BROKER = EventBroker()
-BUFFERS: dict[str, CaptionBuffer] = {}  # session_id -> CaptionBuffer
 
 # ─────────────────────────────────────────────────────────────
-# 헬스/인덱스
+# HTTP 청크 경로의 세션별 상태
 # ─────────────────────────────────────────────────────────────
-@app.get("/health")
-def health():
-    return {"ok": True}
+def _http_buffer() -> CaptionBuffer:
+    return CaptionBuffer(min_window_sec=10.0, max_window_sec=15.0, min_chars=25)
 
-@app.get("/", response_class=HTMLResponse)
-def index():
-    return """
+@dataclass(slots=True)
+class LiveSession:
+    """/session/start ~ /session/stop 동안의 상태. 청크마다 dict 조회 1번, 종료 시 pop 1번으로 정리"""
+    timeline: float = 0.0  # 글로벌 타임라인 (직전 청크의 끝 시각)
+    buffer: CaptionBuffer = field(default_factory=_http_buffer)
+    rolling: RollingTranscriber | None = None  # mode=rolling일 때만
+    queue: asyncio.Queue | None = None  # (audio_bytes, ext, content-type, filename) (None = 종료)
+    worker: asyncio.Task | None = None  # _chunk_worker (첫 청크에서 기동)
+
+LIVE: dict[str, LiveSession] = {}  # session_id -> LiveSession
+
+# ─────────────────────────────────────────────────────────────
+# WebSocket 송신 코얼레싱
+# ─────────────────────────────────────────────────────────────
+class OutboundQueue:
+    """
+    같은 이벤트 루프 틱에 쌓인 메시지를 한 프레임으로 묶어 전송 (애플리케이션 레벨 Nagle)
+    - 1개면 그대로 전송 (지연 변화 없음)
+    - 여러 개면 {"type": "batch", "msgs": [...]} 하나로 전송
+    - binary=True(proto=bin)면 app.frames 바이너리 프레임을 이어붙여 send_bytes 한 번
+    - 메시지는 push 시점에 직렬화 → 묶음 프레임은 bytes join만 (dict를 다시 직렬화하지 않음)
+    """
+    def __init__(self, ws: WebSocket, interval: float = 0.0, binary: bool = False):
+        self._ws = ws
+        self._binary = binary
+        self._interval = interval  # 0이면 같은 틱에 생긴 메시지만 묶음
+        self._pending: list[bytes] = []  # 직렬화된 메시지 (JSON 또는 바이너리 프레임)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def push(self, msg: dict):
+        if self._closed:
+            return
+        self._pending.append(pack_msg(msg) if self._binary else dumps_json(msg))
+        self._wakeup.set()
+
+    async def _drain(self):
+        msgs, self._pending = self._pending, []
+        if not msgs:
+            return
+        if self._binary:
+            await self._ws.send_bytes(b"".join(msgs))
+        elif len(msgs) == 1:
+            # 텍스트 프레임 유지 (JSON.parse 하는 기존 클라이언트 호환)
+            await self._ws.send_text(msgs[0].decode())
+        else:
+            await self._ws.send_text((b'{"type":"batch","msgs":[' + b",".join(msgs) + b"]}").decode())
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if not self._closing:
+                    await asyncio.sleep(self._interval)
+                await self._drain()
+                if self._closing:
+                    break
+        except Exception:
+            pass  # 소켓이 닫힘 → 이후 push는 버림
+        finally:
+            self._closed = True
+            self._pending.clear()
+
+    async def close(self):
+        """남은 메시지를 마지막으로 보내고 송신 태스크 종료"""
+        self._closing = True
+        self._wakeup.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+# ─────────────────────────────────────────────────────────────
+# 라이프사이클 (번역 배처, 워밍업)
+# ─────────────────────────────────────────────────────────────
+@app.on_event("startup")
+async def _startup():
+    translate_batcher.start()
+    if os.getenv("WARMUP", "1") != "0":
+        spawn_bg(_warmup())  # 기다리지 않음: API가 느리거나 막혀도 /health는 바로 응답
+
+async def _warmup():
+    # ASR/번역 경로를 미리 데워 첫 청크의 콜드 스타트(TLS, 모델 로드) 지연을 숨김. 실패해도 기동은 계속
+    try:
+        await run_in(ASR_POOL, asr.warmup)
+        print("[DEBUG] ASR warmup done")
+    except Exception as e:
+        print(f"[DEBUG] ASR warmup failed: {e}")
+    try:
+        await translate.warmup()
+        print("[DEBUG] Translate warmup done")
+    except Exception as e:
+        print(f"[DEBUG] Translate warmup failed: {e}")
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await translate_batcher.stop()
+    await asyncio.to_thread(SESSION.close)  # 남은 JSONL 줄 기록
+    pools.shutdown()
+
+# ─────────────────────────────────────────────────────────────
+# 헬스/인덱스
+# ─────────────────────────────────────────────────────────────
+# 매 요청 dict→JSON, str→bytes 인코딩을 하지 않도록 import 시 1회만 직렬화
+_HEALTH_BYTES = b'{"ok":true}'
+_INDEX_BYTES = """
     <!doctype html>
     <html>
     <head><meta charset="utf-8"><title>Live Caption Translator</title></head>
@@ -186,13 +361,23 @@ def index():
       <ul>
         <li>Health: <a href="/health">/health</a></li>
         <li>API Docs (Swagger): <a href="/docs">/docs</a></li>
-        <li>WebSocket: <code>ws://localhost:8000/ws/stream?session_id=demo</code></li>
+        <li>WebSocket: <code>ws://localhost:8000/ws/stream?session_id=demo</code> (raw PCM16: <code>&amp;format=pcm16</code>, rolling buffer: <code>&amp;mode=rolling</code>, binary frames: <code>&amp;proto=bin</code>; send text <code>eos</code> to flush the last batch before the server closes)</li>
         <li>SSE events: <code>/events?session_id=&lt;id&gt;</code></li>
+        <li>HTTP chunks with rolling buffer: <code>POST /session/start?mode=rolling</code></li>
+        <li>Raw PCM upload: <code>POST /chunk_pcm?session_id=&lt;id&gt;</code> (16 kHz mono Int16 body)</li>
         <li>Export (legacy GET): <code>/export/&lt;session_id&gt;?format=txt|docx|srt</code></li>
       </ul>
     </body>
     </html>
-    """
+    """.encode()
+
+@app.get("/health")
+async def health():
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    return Response(content=_INDEX_BYTES, media_type="text/html")
 
 # ─────────────────────────────────────────────────────────────
 # SSE (서버 푸시)
@@ -200,26 +385,26 @@ def index():
 @app.get("/events")
 async def sse_events(request: Request, session_id: str):
     async def gen():
-        q = await BROKER.subscribe(session_id)
+        ch = await BROKER.subscribe(session_id)
+        pos = ch.total  # 구독 이후 프레임만
         try:
             # handshake
-            yield "event: ping\ndata: {}\n\n"
+            yield _SSE_PING
             while True:
                 if await request.is_disconnected():
                     break
-                try:
-                    msg = await asyncio.wait_for(q.get(), timeout=30.0)
-                    payload = (
-                        f"event: {msg['type']}\n"
-                        f"id: {msg['id']}\n"
-                        f"data: {json.dumps(msg['data'], ensure_ascii=False)}\n\n"
-                    )
-                    yield payload
-                except asyncio.TimeoutError:
-                    # keep-alive comment
-                    yield ": keep-alive\n\n"
+                if pos == ch.total:
+                    try:
+                        await asyncio.wait_for(ch.event.wait(), timeout=30.0)
+                    except asyncio.TimeoutError:
+                        # keep-alive comment
+                        yield _SSE_KEEPALIVE
+                    continue
+                # publish에서 이미 인코딩된 프레임 bytes (밀린 만큼 한 번에)
+                chunk, pos = ch.since(pos)
+                yield chunk
         finally:
-            await BROKER.unsubscribe(session_id, q)
+            await BROKER.unsubscribe(session_id, ch)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -230,126 +415,210 @@ async def sse_events(request: Request, session_id: str):
 # ─────────────────────────────────────────────────────────────
 # WebSocket (옵션)
 # ─────────────────────────────────────────────────────────────
+WS_MAX_BACKLOG = int(os.getenv("WS_MAX_BACKLOG", "2"))  # 연결당 ASR 대기 청크 상한
 @app.websocket("/ws/stream")
-async def ws_stream(websocket: WebSocket, session_id: str = Query("default")):
+async def ws_stream(
+    websocket: WebSocket,
+    session_id: str = Query("default"),
+    audio_format: str = Query("webm", alias="format"),  # "webm"(컨테이너) | "pcm16"(raw 16kHz mono Int16)
+    mode: str = Query("chunk"),  # "chunk"(청크별 독립 전사) | "rolling"(롤링 버퍼 + LocalAgreement-2)
+    proto: str = Query("json"),  # "json"(텍스트 프레임) | "bin"(app/frames.py 바이너리 프레임)
+):
     await websocket.accept()
-    SESSION.start(session_id)
+    await asyncio.to_thread(SESSION.start, session_id)  # 재시작 후 첫 연결이면 JSONL 복원(파일 읽기)
+    # raw PCM이면 서버측 컨테이너 디코드 생략 (asr는 .pcm 확장자로 판별)
+    chunk_name = "chunk.pcm" if audio_format == "pcm16" else "chunk.webm"
+
+    # 수신 → in_q → asr_worker(ASR + partial/final) → out_q → translate_worker(번역 + ko_batch)
+    # 청크 N+1의 ASR과 청크 N 배치의 번역이 겹쳐서 실행됨
+    in_q: asyncio.Queue = asyncio.Queue()   # raw 오디오 bytes (None = 종료)
+    out_q: asyncio.Queue = asyncio.Queue()  # flush된 (t0, t1, text_en) (None = 종료)
+    outbound = OutboundQueue(websocket, binary=proto == "bin")
+    rolling = RollingTranscriber(transcribe_samples) if mode == "rolling" else None
+
+    async def asr_worker():
+        seq = 1
+        pending = None  # {"seq","t0","t1","text_en"}
+        buffer = CaptionBuffer(min_window_sec=10.0, max_window_sec=15.0, min_chars=25)
+        timeline_pos = 0.0
+
+        def _add_final(t0: float, t1: float, text_en: str):
+            # 확정 문장을 배치 번역 버퍼에 쌓고, 준비되면 번역 워커로 넘김 (기다리지 않음)
+            buffer.add(t0, t1, text_en)
+            if buffer.ready():
+                (ft0, ft1), full_en = buffer.flush()
+                out_q.put_nowait((ft0, ft1, full_en))
 
-    seq = 1
-    pending = None  # {"seq","t0","t1","text_en"}
-    buffer = CaptionBuffer(min_window_sec=10.0, max_window_sec=15.0, min_chars=25)
-    timeline_pos = 0.0
-
-    try:
-        while True:
-            audio_bytes = await websocket.receive_bytes()
-            asr = transcribe_chunk(audio_bytes)
-            text_en = clean_en((asr["text"] or "").strip())
-
-            if asr["segments"]:
-                seg_t0 = asr["segments"][0]["start"]
-                seg_t1 = asr["segments"][-1]["end"]
-            else:
-                seg_t0 = seg_t1 = 0.0
-
-            # 직전 pending을 final로 확정 + 배치 번역 후보로 버퍼링
+        try:
+            while (audio_bytes := await in_q.get()) is not None:
+                try:
+                    if rolling is not None:
+                        # 두 번 연속 같은 가설이 나온 단어만 en_final, 나머지 꼬리는 en_partial
+                        committed, tentative = await run_in(ASR_POOL, _rolling_feed, rolling, audio_bytes, chunk_name)
+                        if committed:
+                            final = {"seq": seq, "t0": round(committed[0].start, 2), "t1": round(committed[-1].end, 2),
+                                     "text_en": words_to_text(committed)}
+                            outbound.push({"type": "en_final", **final})
+                            _add_final(final["t0"], final["t1"], final["text_en"])
+                            seq += 1
+                        pending = None
+                        if tentative:
+                            pending = {"seq": seq, "t0": round(tentative[0].start, 2), "t1": round(tentative[-1].end, 2),
+                                       "text_en": words_to_text(tentative)}
+                            outbound.push({"type": "en_partial", **pending})
+                        continue
+
+                    asr = await run_in(ASR_POOL, transcribe_chunk, audio_bytes, filename=chunk_name)
+                except Exception as e:
+                    # 청크 하나의 ASR 실패로 연결 전체를 끊지 않음
+                    print(f"[DEBUG] WS ASR error: {e}")
+                    outbound.push({"type": "error", "message": str(e)})
+                    continue
+
+                text_en = clean_en(asr["text"] or "")  # clean_en이 공백 정규화/strip까지 처리
+                segs = asr["segments"]
+                seg_t0, seg_t1 = (segs[0]["start"], segs[-1]["end"]) if segs else (0.0, 0.0)
+
+                if pending:
+                    # 직전 pending을 final로 확정 + 배치 번역 후보로 버퍼링
+                    if pending["text_en"]:
+                        outbound.push({"type": "en_final", **pending})
+                        _add_final(pending["t0"], pending["t1"], pending["text_en"])
+                    timeline_pos = pending["t1"]
+
+                # 이번 청크는 partial
+                pending = {
+                    "seq": seq,
+                    "t0": round(timeline_pos + seg_t0, 2), "t1": round(timeline_pos + seg_t1, 2),
+                    "text_en": text_en,
+                }
+                outbound.push({"type": "en_partial", **pending})
+                seq += 1
+
+            # 종료: 남은 pending/버퍼를 마지막 배치로
             if pending and pending["text_en"]:
-                await websocket.send_json({
-                    "type": "en_final",
-                    "seq": pending["seq"],
-                    "t0": pending["t0"], "t1": pending["t1"],
-                    "text_en": pending["text_en"],
-                })
                 buffer.add(pending["t0"], pending["t1"], pending["text_en"])
-                if buffer.ready():
-                    (ft0, ft1), full_en = buffer.flush()
-                    text_ko = translate_text(full_en) if full_en else ""
-                    SESSION.append(session_id, ft0, ft1, full_en, text_ko)
-                    await websocket.send_json({
-                        "type": "ko_batch",
-                        "window": {"t0": ft0, "t1": ft1},
-                        "text_en": full_en,
-                        "text_ko": text_ko
-                    })
-                timeline_pos = pending["t1"]
-
-            g_t0 = timeline_pos + seg_t0
-            g_t1 = timeline_pos + seg_t1
-
-            # 이번 청크는 partial
-            cur = {"seq": seq, "t0": r2(g_t0), "t1": r2(g_t1), "text_en": text_en}
-            await websocket.send_json({
-                "type": "en_partial",
-                "seq": seq,
-                "t0": r2(g_t0), "t1": r2(g_t1),
-                "text_en": text_en
+            if getattr(buffer, "en_parts", None):
+                (ft0, ft1), full_en = buffer.flush()
+                out_q.put_nowait((ft0, ft1, full_en))
+        finally:
+            out_q.put_nowait(None)
+
+    async def translate_worker():
+        # 배치는 flush된 순서대로 번역/확정/전송 (다른 세션의 창과 한 요청으로 묶여 번역)
+        while (item := await out_q.get()) is not None:
+            ft0, ft1, full_en = item
+            try:
+                text_ko = await translate_batcher.enqueue(full_en)
+            except Exception as e:
+                print(f"[DEBUG] WS translate error: {e}")
+                text_ko = ""
+                outbound.push({"type": "error", "message": f"translate failed: {e}"})
+            SESSION.append(session_id, ft0, ft1, full_en, text_ko)
+            outbound.push({
+                "type": "ko_batch",
+                "window": {"t0": ft0, "t1": ft1},
+                "text_en": full_en,
+                "text_ko": text_ko
             })
-            pending = cur
-            seq += 1
 
+    asr_task = asyncio.create_task(asr_worker())
+    mt_task = asyncio.create_task(translate_worker())
+    eos = False
+    try:
+        # 수신 루프는 ASR을 기다리지 않고 계속 다음 청크를 받음
+        while True:
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            audio_bytes = msg.get("bytes")
+            if audio_bytes is None:
+                # 텍스트 "eos": 클라이언트 전송 끝 → 연결이 열린 채로 남은 청크/마지막 배치까지 보내고 서버가 닫음
+                if msg.get("text") == "eos":
+                    eos = True
+                    break
+                continue
+            if in_q.qsize() >= WS_MAX_BACKLOG:
+                # ASR이 못 따라감 → raw PCM은 대기 청크를 이어붙여 한 번에, 컨테이너는 가장 오래된 청크를 버림
+                if audio_format == "pcm16":
+                    backlog = [in_q.get_nowait() for _ in range(in_q.qsize())]
+                    audio_bytes = b"".join([*backlog, audio_bytes])
+                else:
+                    in_q.get_nowait()
+                    print(f"[DEBUG] WS backlog full, dropped oldest chunk: {session_id}")
+            in_q.put_nowait(audio_bytes)
     except WebSocketDisconnect:
-        if pending and pending["text_en"]:
-            buffer.add(pending["t0"], pending["t1"], pending["text_en"])
-        if getattr(buffer, "en_parts", None):
-            (ft0, ft1), full_en = buffer.flush()
-            text_ko = translate_text(full_en) if full_en else ""
-            SESSION.append(session_id, ft0, ft1, full_en, text_ko)
-        SESSION.end(session_id)
+        pass
     except Exception as e:
-        try:
-            await websocket.send_json({"type": "error", "message": str(e)})
-        except Exception:
-            pass
+        outbound.push({"type": "error", "message": str(e)})
+    finally:
+        # 이미 받은 청크의 ASR → 마지막 배치 번역까지 세션에 기록한 뒤 종료 (전송 실패는 무시)
+        in_q.put_nowait(None)
+        await asyncio.gather(asr_task, mt_task, return_exceptions=True)
+        SESSION.end(session_id)
+        await outbound.close()
+        if eos:
+            try:
+                await websocket.close()
+            except Exception:
+                pass
 
 # ─────────────────────────────────────────────────────────────
 # REST: 세션/청크/트랜스크립트/내보내기
 # ─────────────────────────────────────────────────────────────
 @app.post("/session/start")
-def http_session_start():
+def http_session_start(mode: str = Query("chunk")):  # "chunk"(청크별 독립 전사) | "rolling"(롤링 버퍼 + LocalAgreement-2)
     sid = str(uuid.uuid4())
     SESSION.start(sid)
-    SESSION_TIMELINE[sid] = 0.0
-    (DATA_DIR / "sessions" / sid).mkdir(parents=True, exist_ok=True)
-    print(f"[DEBUG] Session started: {sid}")
+    LIVE[sid] = LiveSession(rolling=RollingTranscriber(transcribe_samples) if mode == "rolling" else None)
+    # 청크 보관 디렉터리는 여기서 한 번만 생성 (청크마다 mkdir/stat 하지 않음)
+    (DATA_DIR / "sessions" / sid / "chunks").mkdir(parents=True, exist_ok=True)
+    print(f"[DEBUG] Session started: {sid} (mode={mode})")
     return {"session_id": sid}
 
 @app.post("/session/stop")
 async def http_session_stop(session_id: str = Form(...)):
     print(f"[DEBUG] Session stop requested: {session_id}")
-    if session_id not in SESSION_TIMELINE:
+    # 먼저 빼서 이후 업로드는 invalid session_id로 거절
+    live = LIVE.pop(session_id, None)
+    if live is None:
         print(f"[DEBUG] Invalid session ID: {session_id}")
-        print(f"[DEBUG] Available sessions: {list(SESSION_TIMELINE.keys())}")
+        print(f"[DEBUG] Available sessions: {list(LIVE.keys())}")
         return JSONResponse({"ok": False, "reason": "invalid session_id"}, status_code=400)
 
     try:
+        # 이미 받은 청크를 끝까지 처리한 뒤 세션을 닫음
+        if live.worker is not None:
+            await live.queue.put(None)
+            await live.worker
+
         # 남은 버퍼 플러시
-        buf = BUFFERS.pop(session_id, None)
-        if buf and getattr(buf, "en_parts", None):
+        buf = live.buffer
+        rt = live.rolling
+        if rt is not None and rt.agree.tentative:
+            # 롤링 모드: 아직 확정되지 않은 꼬리도 마지막 배치에 포함
+            tail = rt.agree.tentative
+            buf.add(tail[0].start, tail[-1].end, clean_en(words_to_text(tail)))
+        if buf.en_parts:
             (ft0, ft1), full_en = buf.flush()
             if full_en:
-                text_ko = translate_text(full_en)
-                SESSION.append(session_id, ft0, ft1, full_en, text_ko)
-                # 세션 종료 직전 마지막 배치도 알림(구독자가 보통 열려있을 수 있음)
-                await BROKER.publish(session_id, "ko_batch", {
-                    "window": {"t0": r2(ft0), "t1": r2(ft1)},
-                    "text_en": full_en,
-                    "text_ko": text_ko
-                })
+                # 세션 종료 직전 마지막 배치도 알림(구독자가 보통 열려있을 수 있음). 번역 실패 시 영어만 기록
+                await _commit_batch(session_id, ft0, ft1, full_en)
 
-        SESSION.end(session_id)
-        SESSION_TIMELINE.pop(session_id, None)
         print(f"[DEBUG] Session stopped successfully: {session_id}")
         return JSONResponse({"ok": True})
     except Exception as e:
         print(f"[DEBUG] Session stop error: {e}")
         return JSONResponse({"ok": False, "reason": f"Session stop failed: {str(e)}"}, status_code=500)
+    finally:
+        SESSION.end(session_id)  # 실패해도 JSONL 핸들은 닫음
 
 @app.post("/session/pause")
 async def http_session_pause(session_id: str = Form(...)):
     print(f"[DEBUG] Session pause requested: {session_id}")
-    if session_id not in SESSION_TIMELINE:
+    if session_id not in LIVE:
         print(f"[DEBUG] Invalid session ID: {session_id}")
-        print(f"[DEBUG] Available sessions: {list(SESSION_TIMELINE.keys())}")
+        print(f"[DEBUG] Available sessions: {list(LIVE.keys())}")
         return JSONResponse({"ok": False, "reason": "invalid session_id"}, status_code=400)
 
     try:
@@ -360,31 +629,28 @@ async def http_session_pause(session_id: str = Form(...)):
         print(f"[DEBUG] Session pause error: {e}")
         return JSONResponse({"ok": False, "reason": f"Session pause failed: {str(e)}"}, status_code=500)
 
+async def _save_chunk(path: Path, data: bytes):
+    try:
+        await asyncio.to_thread(path.write_bytes, data)
+    except Exception as e:
+        print(f"[DEBUG] Chunk save failed: {path.name}: {e}")
+
+# 컨테이너 매직 바이트: EBML(WebM) 1A 45 DF A3 / Ogg "OggS" / Matroska cluster 1F 43 B6 75
+_MAGIC = frozenset({b"\x1A\x45\xDF\xA3", b"OggS", b"\x1F\x43\xB6\x75"})
+_EBML = b"\x1A\x45\xDF\xA3"
+
 def _looks_like_webm_or_ogg(b: bytes) -> bool:
-    if not b or len(b) < 16:
+    if len(b) < 16:
         return False
-    h = b[:4]
-    # EBML(WebM): 1A 45 DF A3
-    if h == bytes([0x1A, 0x45, 0xDF, 0xA3]):
-        return True
-    # Ogg: "OggS"
-    if h == b"OggS":
-        return True
-    # Matroska cluster magic (예: 1F 43 B6 75) 체크
-    h4 = b[:4]
-    if h4 == bytes([0x1F, 0x43, 0xB6, 0x75]):
-        return True
-    # 앞 64바이트 안에 EBML 헤더가 있는지
-    if b.find(bytes([0x1A, 0x45, 0xDF, 0xA3]), 0, 64) != -1:
-        return True
-    return False
+    # 대부분 첫 4바이트에서 끝남 → 아닐 때만 앞 64바이트 안에서 EBML 헤더 탐색
+    return b[:4] in _MAGIC or b.find(_EBML, 0, 64) != -1
 
 @app.post("/chunk")
 async def http_upload_chunk(session_id: str = Form(...), blob: UploadFile = File(...)):
     print(f"[DEBUG] Chunk upload for session: {session_id}")
-    if session_id not in SESSION_TIMELINE:
+    if session_id not in LIVE:
         print(f"[DEBUG] Invalid session ID in chunk upload: {session_id}")
-        print(f"[DEBUG] Available sessions: {list(SESSION_TIMELINE.keys())}")
+        print(f"[DEBUG] Available sessions: {list(LIVE.keys())}")
         return JSONResponse({"ok": False, "reason": "invalid session_id"}, status_code=400)
 
     # 파일 크기 검증
@@ -392,79 +658,139 @@ async def http_upload_chunk(session_id: str = Form(...), blob: UploadFile = File
         print(f"[DEBUG] File too small: {getattr(blob, 'size', None)} bytes")
         return Response(status_code=204)
 
-    # 파일 저장(선택)
-    sess_dir = DATA_DIR / "sessions" / session_id / "chunks"
-    sess_dir.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    ext = Path(blob.filename).suffix or ".webm"
-    save_path = sess_dir / f"chunk_{ts}{ext}"
-    with save_path.open("wb") as f:
-        shutil.copyfileobj(blob.file, f)
-
-    # 파일 읽기
-    with save_path.open("rb") as f:
-        audio_bytes = f.read()
+    # 업로드는 메모리로 한 번만 읽음 (디스크에 썼다가 다시 읽지 않음)
+    audio_bytes = await blob.read()
 
     # 파일 크기 재검증
     if len(audio_bytes) < 100:
         print(f"[DEBUG] Skipping small chunk: {len(audio_bytes)} bytes")
         return Response(status_code=204)
 
-    # 업로드된 실제 content-type/확장자 로깅(디버그에 유용)
     uploaded_ct = getattr(blob, "content_type", None) or "unknown"
-    ext = (save_path.suffix or "").lower()
-    safe_name = save_path.name  # SDK가 filename 확장자로 포맷을 추론
+    if not _looks_like_webm_or_ogg(audio_bytes):
+        # 헤더 없는 MediaRecorder 후속 청크 등 → ASR에서 415가 날 수 있어 원인 파악용으로만 기록
+        print(f"[DEBUG] Chunk has no WebM/Ogg header: {audio_bytes[:4].hex()} (ct={uploaded_ct})")
+    return await _ingest_chunk(session_id, audio_bytes, Path(blob.filename).suffix or ".webm", uploaded_ct)
 
-    print(f"[DEBUG] Processing chunk: {len(audio_bytes)} bytes, type: {uploaded_ct}, ext: {ext}")
+@app.post("/chunk_pcm")
+async def http_upload_chunk_pcm(request: Request, session_id: str = Query(...)):
+    """
+    raw 16kHz mono Int16(LE) PCM을 요청 본문 그대로 받음 (multipart 파싱/컨테이너 디코드 생략)
+    클라이언트: AudioWorklet 등으로 16kHz Int16Array를 만들어 application/octet-stream으로 POST
+    """
+    print(f"[DEBUG] PCM chunk upload for session: {session_id}")
+    if session_id not in LIVE:
+        print(f"[DEBUG] Invalid session ID in chunk upload: {session_id}")
+        return JSONResponse({"ok": False, "reason": "invalid session_id"}, status_code=400)
 
-    # ASR 수행
+    audio_bytes = await request.body()
+    if len(audio_bytes) < 100:
+        print(f"[DEBUG] Skipping small chunk: {len(audio_bytes)} bytes")
+        return Response(status_code=204)
+
+    return await _ingest_chunk(session_id, audio_bytes, ".pcm", request.headers.get("content-type") or "unknown")
+
+async def _ingest_chunk(session_id: str, audio_bytes: bytes, ext: str, uploaded_ct: str):
+    """/chunk, /chunk_pcm 공용: 보관(백그라운드) + 세션 큐에 넣고 202. ASR/번역/SSE는 _chunk_worker에서"""
+    live = LIVE.get(session_id)
+    if live is None:  # 본문을 읽는 사이 /session/stop
+        return JSONResponse({"ok": False, "reason": "invalid session_id"}, status_code=400)
+    # 느린 ASR 뒤로 청크가 무한정 쌓이지 않도록 세션별 대기열 상한
+    q = live.queue
+    if q is not None and q.full():
+        print(f"[DEBUG] Too many pending chunks for session: {session_id}")
+        return JSONResponse({"ok": False, "reason": "too many pending chunks"}, status_code=429)
+
+    # 파일 저장(선택): 보관용 쓰기는 백그라운드로 (디렉터리는 /session/start에서 생성)
+    save_path = DATA_DIR / "sessions" / session_id / "chunks" / f"chunk_{_chunk_id()}{ext}"
+    if SAVE_CHUNKS:
+        spawn_bg(_save_chunk(save_path, audio_bytes))
+
+    # 업로드된 실제 content-type/확장자 로깅(디버그에 유용)
+    ext = ext.lower()
+    print(f"[DEBUG] Queued chunk: {len(audio_bytes)} bytes, type: {uploaded_ct}, ext: {ext}")
+
+    if q is None:
+        q = live.queue = asyncio.Queue(maxsize=CHUNK_MAX_PENDING)
+        live.worker = spawn_bg(_chunk_worker(session_id, live))
+    # SDK가 filename 확장자로 포맷을 추론 (.pcm이면 raw PCM 경로)
+    q.put_nowait((audio_bytes, ext, uploaded_ct, save_path.name))
+    return JSONResponse({"ok": True, "saved": save_path.name if SAVE_CHUNKS else None, "queued": q.qsize()}, status_code=202)
+
+async def _chunk_worker(session_id: str, live: LiveSession):
+    # 세션당 1개: 청크를 하나씩 처리하므로 타임라인/버퍼 갱신에 락이 필요 없음
+    while (item := await live.queue.get()) is not None:
+        try:
+            await _process_chunk(session_id, live, *item)
+        except Exception as e:
+            # 청크 하나의 실패로 워커를 멈추지 않음
+            print(f"[DEBUG] Chunk processing error: {type(e).__name__}: {e}")
+            await BROKER.publish(session_id, "chunk_error", {"status": 500, "reason": str(e)})
+
+async def _process_chunk(session_id: str, live: LiveSession, audio_bytes: bytes, ext: str, uploaded_ct: str, safe_name: str):
+    """ASR → 타임라인 → SSE en_partial → 배치 번역 → SSE ko_batch. 실패는 SSE chunk_error로 알림"""
+    rt = live.rolling
+    # ASR 수행 (롤링 모드는 버퍼 전체 재전사 → 확정된 단어만)
     try:
-        asr = transcribe_chunk(audio_bytes, filename=safe_name)
+        if rt is not None:
+            committed, _ = await run_in(ASR_POOL, _rolling_feed, rt, audio_bytes, safe_name)
+        else:
+            asr = await run_in(ASR_POOL, transcribe_chunk, audio_bytes, filename=safe_name)
     except ValueError as e:
         # 포맷/디코딩 실패 등 → 415 (Unsupported Media Type)
         msg = f"ASR error: {str(e)} (ct={uploaded_ct}, ext={ext})"
         print(f"[DEBUG] ASR ValueError: {msg}")
-        return JSONResponse({"ok": False, "reason": msg}, status_code=415)
+        await BROKER.publish(session_id, "chunk_error", {"status": 415, "reason": msg})
+        return
     except Exception as e:
         # 기타 예외 → 400으로 다운그레이드
         msg = f"ASR unexpected error: {type(e).__name__}: {str(e)} (ct={uploaded_ct}, ext={ext})"
         print(f"[DEBUG] ASR Exception: {msg}")
-        return JSONResponse({"ok": False, "reason": msg}, status_code=400)
-
-    text_en = clean_en((asr.get("text") or "").strip())
-    seg_t0 = asr["segments"][0]["start"] if asr.get("segments") else 0.0
-    seg_t1 = asr["segments"][-1]["end"] if asr.get("segments") else 0.0
+        await BROKER.publish(session_id, "chunk_error", {"status": 400, "reason": msg})
+        return
+
+    # 글로벌 타임라인: 세션 워커 1개만 읽고 갱신 → 같은 세션의 연속 업로드도 구간이 겹치지 않음
+    last_end = live.timeline
+    if rt is not None:
+        # 롤링 버퍼의 단어 시간은 이미 세션 기준 절대 시간. 이번에 확정된 게 없으면 빈 결과
+        text_en = clean_en(words_to_text(committed))
+        g_t0, g_t1 = (committed[0].start, committed[-1].end) if committed else (last_end, last_end)
+        live.timeline = g_t1
+    else:
+        text_en = clean_en(asr.get("text") or "")  # clean_en이 공백 정규화/strip까지 처리
+        segs = asr.get("segments")
+        seg_t0, seg_t1 = (segs[0]["start"], segs[-1]["end"]) if segs else (0.0, 0.0)
+        g_t0 = last_end + seg_t0
+        g_t1 = live.timeline = last_end + seg_t1
 
     print(f"[DEBUG] ASR result: '{text_en}' ({len(text_en)} chars)")
 
-    # 글로벌 타임라인
-    last_end = SESSION_TIMELINE.get(session_id, 0.0)
-    g_t0 = last_end + seg_t0
-    g_t1 = last_end + seg_t1
-    SESSION_TIMELINE[session_id] = g_t1
-
-    # (1) en_partial을 즉시 SSE로 전송
-    await BROKER.publish(session_id, "en_partial", {"t0": r2(g_t0), "t1": r2(g_t1), "text_en": text_en})
+    # (1) en_partial을 즉시 SSE로 전송 (롤링 모드는 새로 확정된 텍스트가 있을 때만)
+    if text_en or rt is None:
+        await BROKER.publish(session_id, "en_partial", {"t0": round(g_t0, 2), "t1": round(g_t1, 2), "text_en": text_en})
 
     # (2) 배치 번역을 위한 버퍼링
-    buf = BUFFERS.get(session_id)
-    if buf is None:
-        buf = CaptionBuffer(min_window_sec=10.0, max_window_sec=15.0, min_chars=25)
-        BUFFERS[session_id] = buf
+    buf = live.buffer
     buf.add(g_t0, g_t1, text_en)
 
     # (3) 준비되면 flush → 번역 → 세션 누적 → SSE ko_batch
     if buf.ready():
         (ft0, ft1), full_en = buf.flush()
-        text_ko = translate_text(full_en) if full_en else ""
-        SESSION.append(session_id, ft0, ft1, full_en, text_ko)
-        await BROKER.publish(session_id, "ko_batch", {
-            "window": {"t0": r2(ft0), "t1": r2(ft1)},
-            "text_en": full_en,
-            "text_ko": text_ko
-        })
+        await _commit_batch(session_id, ft0, ft1, full_en)
 
-    return JSONResponse({"ok": True, "saved": save_path.name, "text_en": text_en, "t0": r2(g_t0), "t1": r2(g_t1)})
+async def _commit_batch(session_id: str, ft0: float, ft1: float, full_en: str):
+    # flush된 창은 버퍼에서 이미 빠졌으므로 번역이 실패해도 영어 원문은 세션에 남김 (WS translate_worker와 동일)
+    try:
+        text_ko = await translate_batcher.enqueue(full_en)
+    except Exception as e:
+        print(f"[DEBUG] Translate error: {session_id}: {e}")
+        text_ko = ""
+    SESSION.append(session_id, ft0, ft1, full_en, text_ko)
+    await BROKER.publish(session_id, "ko_batch", {
+        "window": {"t0": round(ft0, 2), "t1": round(ft1, 2)},
+        "text_en": full_en,
+        "text_ko": text_ko
+    })
 
 @app.get("/transcript")
 def http_transcript(session_id: str):
@@ -474,66 +800,65 @@ def http_transcript(session_id: str):
         content = ""
     return {"transcript": content}
 
-@app.post("/export")
-def http_export(session_id: str = Form(...), format: str = "docx"):
-    data = SESSION.get(session_id)
-    entries = data.get("entries", []) if data else []
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+# 내보내기 포맷 → (media type, docx 여부). /export, /download, GET /export/{sid} 공용
+_MT = {
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", True),
+    "srt": ("application/x-subrip", False),
+    "txt": ("text/plain", False),
+}
 
-    if format == "txt":
-        content = SESSION.to_txt(session_id)
-        out = (DATA_DIR / "exports" / f"{session_id}_{ts}.txt")
-        out.write_text(content, encoding="utf-8")
-        return {"download_url": f"/download/{out.name}"}
+def _text_export(session_id: str, fmt: str) -> str:
+    return SESSION.to_txt(session_id) if fmt == "txt" else SESSION.to_srt(session_id)
 
-    if format == "srt":
-        content = SESSION.to_srt(session_id)
-        out = (DATA_DIR / "exports" / f"{session_id}_{ts}.srt")
-        out.write_text(content, encoding="utf-8")
-        return {"download_url": f"/download/{out.name}"}
+def _write_docx(out: Path, session_id: str, data):
+    out.write_bytes(b"".join(iter_docx_cached(session_id, data)))
 
-    # docx
-    buf: BytesIO = build_docx(entries)
-    out = (DATA_DIR / "exports" / f"{session_id}_{ts}.docx")
-    out.write_bytes(buf.getvalue())
-    return {"download_url": f"/download/{out.name}"}
+@app.post("/export")
+async def http_export(session_id: str = Form(...), format: str = "docx", persist: int = 0):
+    # 기본: 파일을 응답으로 바로 스트리밍 (디스크 쓰기 + /download 왕복 없음)
+    # persist=1: 예전처럼 data/exports에 보관하고 download_url 반환
+    if format not in _MT:
+        format = "docx"  # 알 수 없는 포맷은 예전처럼 docx
+    mt, is_docx = _MT[format]
+    name = f"{session_id}_{_export_ts()}.{format}"
+    out = DATA_DIR / "exports" / name
+
+    # 문자열 조립/파일 쓰기는 스레드에서 (sync def 핸들러가 anyio 스레드풀 슬롯을 붙잡지 않도록 async + to_thread)
+    if not is_docx:
+        content = await asyncio.to_thread(_text_export, session_id, format)
+        if persist:
+            await asyncio.to_thread(out.write_text, content, encoding="utf-8")
+            return {"download_url": f"/download/{out.name}"}
+        return PlainTextResponse(content, media_type=mt, headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+    data = await asyncio.to_thread(SESSION.get, session_id)  # 재시작 후 첫 접근이면 JSONL 복원(파일 읽기)
+    if persist:
+        await asyncio.to_thread(_write_docx, out, session_id, data)
+        return {"download_url": f"/download/{out.name}"}
+    return StreamingResponse(
+        iter_docx_cached(session_id, data), media_type=mt,
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
 
 @app.get("/download/{filename}")
 def http_download(filename: str):
     file_path = DATA_DIR / "exports" / filename
-    if not file_path.exists():
+    mt, _ = _MT.get(file_path.suffix[1:], (None, None))
+    if mt is None or not file_path.exists():
         return PlainTextResponse("file not found", status_code=404)
-    if file_path.suffix == ".docx":
-        mt = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    elif file_path.suffix == ".srt":
-        mt = "application/x-subrip"
-    else:
-        mt = "text/plain"
     return FileResponse(file_path, filename=file_path.name, media_type=mt)
 
 # ─────────────────────────────────────────────────────────────
 # 기존 내보내기 (GET /export/{session_id})
 # ─────────────────────────────────────────────────────────────
 @app.get("/export/{session_id}")
-def export_text(session_id: str, format: str = Query("txt")):
-    data = SESSION.get(session_id)
-    entries = data.get("entries", [])
-
-    if format == "txt":
-        content = SESSION.to_txt(session_id)
-        return PlainTextResponse(
-            content, headers={"Content-Disposition": f'attachment; filename="{session_id}.txt"'}
-        )
-    if format == "docx":
-        buf = build_docx(entries)
-        return StreamingResponse(
-            buf,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={"Content-Disposition": f'attachment; filename="{session_id}.docx"'}
-        )
-    if format == "srt":
-        content = SESSION.to_srt(session_id)
-        return PlainTextResponse(
-            content, headers={"Content-Disposition": f'attachment; filename="{session_id}.srt"'}
-        )
-    return PlainTextResponse("Unsupported format", status_code=400)
+async def export_text(session_id: str, format: str = Query("txt")):
+    mt, is_docx = _MT.get(format, (None, None))
+    if mt is None:
+        return PlainTextResponse("Unsupported format", status_code=400)
+    headers = {"Content-Disposition": f'attachment; filename="{session_id}.{format}"'}
+    if is_docx:
+        data = await asyncio.to_thread(SESSION.get, session_id)  # 재시작 후 첫 접근이면 JSONL 복원
+        return StreamingResponse(iter_docx_cached(session_id, data), media_type=mt, headers=headers)
+    content = await asyncio.to_thread(_text_export, session_id, format)
+    return PlainTextResponse(content, media_type=mt, headers=headers)
@@ -0,0 +1,21 @@
+# app/pools.py
+# ASR 전용 스레드 풀 (번역은 AsyncOpenAI로 루프에서 직접 await)
+# - asyncio.to_thread는 기본 executor 하나를 공유 → 느린 ASR이 파일 IO까지 막지 않도록 풀을 분리
+# - Whisper(OpenAI SDK 네트워크 대기, CTranslate2 추론)는 GIL을 놓으므로 ProcessPool 대신 ThreadPool
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+N_ASR = int(os.getenv("ASR_WORKERS", "4"))
+
+ASR_POOL = ThreadPoolExecutor(max_workers=N_ASR, thread_name_prefix="asr")
+
+async def run_in(pool: ThreadPoolExecutor, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """블로킹 함수를 지정한 풀에서 실행하고 결과를 await (kwargs 지원)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+def shutdown():
+    ASR_POOL.shutdown(wait=False, cancel_futures=True)
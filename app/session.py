@@ -1,58 +1,203 @@
 # app/session.py
-from typing import Dict, List, Any
+import os
+import queue
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+import orjson
+from cachetools import LRUCache
+
+# 확정 entry를 세션별 JSONL(data/sessions/<sid>/entries.jsonl)에 append → 재시작 후에도 첫 접근 시 복원
+_SAVE_ENTRIES = os.getenv("SAVE_ENTRIES", "1") != "0"
+_SESSIONS_DIR = Path("data") / "sessions"
+_SID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")  # uuid, 테스트용 id 등. 그 외(경로 문자, NUL...)는 저장 안 함
+_NO_JOURNAL = frozenset({"default"})  # WS 기본 session_id: 연결마다 같은 id라 저장하면 재시작을 넘어 계속 합쳐짐
+_STOP = object()
+
+def _new_columns() -> Dict[str, Any]:
+    # column-major(SoA): 인덱스 i가 하나의 entry
+    # t0/t1은 array('d') → C double 연속 버퍼, append 시 용량 배증(amortized O(1))
+    return {
+        "t0": array("d"), "t1": array("d"),
+        "text_en": [], "text_ko": [],
+    }
+
+def _fmt_srt_ts(t_ms: int) -> str:
+    # 12340 -> 00:00:12,340 (정수 밀리초 divmod만, 임시 배열 없음)
+    h, rem = divmod(t_ms, 3_600_000)
+    m, rem = divmod(rem, 60_000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def _blocks(i: int, t0: float, t1: float, text_en: str, text_ko: str) -> Tuple[str, str]:
+    # entry 하나의 TXT/SRT 블록 (i는 1부터)
+    ts0, ts1 = _fmt_srt_ts(int(round(t0 * 1000))), _fmt_srt_ts(int(round(t1 * 1000)))
+    return (
+        f"[{i}] ({t0:.2f}–{t1:.2f}s)\nEN: {text_en}" + (f"\nKO: {text_ko}" if text_ko else ""),
+        f"{i}\n{ts0} --> {ts1}\n{text_en}" + (f"\n{text_ko}" if text_ko else ""),
+    )
+
+def _journal_path(sid: str) -> Optional[Path]:
+    # WS 쿼리로 들어온 임의 session_id가 data/sessions 밖을 가리키거나 파일명으로 쓸 수 없는 경우 제외
+    if not _SAVE_ENTRIES or sid in _NO_JOURNAL or not _SID_RE.fullmatch(sid):
+        return None
+    return _SESSIONS_DIR / sid / "entries.jsonl"
+
+def _last_byte(path: Path) -> bytes:
+    with path.open("rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1)
+
+class _HandleCache(LRUCache):
+    """세션별 열린 JSONL 핸들. 밀려나는 핸들은 닫음"""
+
+    def popitem(self):
+        key, f = super().popitem()
+        f.close()
+        return key, f
+
 class SessionStore:
     def __init__(self):
         self.store: Dict[str, Dict[str, Any]] = {}
+        # /transcript 폴링이 매번 전체 entry를 다시 포맷하지 않도록 append 시점에 블록을 만들어 둠
+        self._txt_blocks: Dict[str, List[str]] = {}
+        self._srt_blocks: Dict[str, List[str]] = {}
+        # (sid, "txt"|"srt") → (블록 수, join 결과). 블록 수가 다르면 무효 → 스레드에서 호출돼도 오래된 결과를 안 돌려줌
+        self._joined: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        # JSONL 쓰기는 전용 스레드 1개가 큐에서 꺼내 처리 (mkdir/open/write/flush가 이벤트 루프를 막지 않음)
+        self._journal_q: queue.SimpleQueue = queue.SimpleQueue()  # (sid, line) | (sid, None)=핸들 닫기 | _STOP
+        self._writer: Optional[threading.Thread] = None
+        self._files = _HandleCache(maxsize=32)  # writer 스레드에서만 접근
+        self._load_lock = threading.Lock()  # 지연 로드는 스레드(to_thread export)에서도 일어남
+
+    def _load(self, sid: str) -> bool:
+        """메모리에 없는 세션을 JSONL에서 복원 (재시작 후 첫 접근 시 1회). 파일이 없으면 False"""
+        path = _journal_path(sid)
+        if path is None or not path.exists():
+            return False
+        with self._load_lock:
+            if sid in self.store:
+                return True
+            cols: Dict[str, Any] = {
+                "created_at": datetime.utcfromtimestamp(path.stat().st_mtime).isoformat(),
+                **_new_columns(),
+            }
+            txt: List[str] = []
+            srt: List[str] = []
+            with path.open("rb") as f:
+                for line in f:
+                    try:
+                        e = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue  # 쓰다가 죽은 마지막 줄
+                    cols["t0"].append(e["t0"])
+                    cols["t1"].append(e["t1"])
+                    cols["text_en"].append(e["en"])
+                    cols["text_ko"].append(e["ko"])
+                    b_txt, b_srt = _blocks(len(txt) + 1, e["t0"], e["t1"], e["en"], e["ko"])
+                    txt.append(b_txt)
+                    srt.append(b_srt)
+            self._txt_blocks[sid] = txt
+            self._srt_blocks[sid] = srt
+            self.store[sid] = cols  # 마지막에 등록 → 다른 스레드는 완성된 상태만 봄
+        print(f"[DEBUG] Session restored from {path}: {len(txt)} entries")
+        return True
+
+    def _journal(self, sid: str, t0: float, t1: float, text_en: str, text_ko: str):
+        # 호출 쪽(이벤트 루프)은 직렬화 + 큐 put만
+        if _journal_path(sid) is None:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="session-journal", daemon=True)
+            self._writer.start()
+        self._journal_q.put((sid, orjson.dumps({"t0": t0, "t1": t1, "en": text_en, "ko": text_ko}) + b"\n"))
+
+    def _write_loop(self):
+        while (item := self._journal_q.get()) is not _STOP:
+            sid, line = item
+            if line is None:
+                f = self._files.pop(sid, None)
+                if f is not None:
+                    f.close()
+                continue
+            # 한 줄 write + flush (entry는 배치 번역마다 1개라 드묾). 실패해도 메모리 기록은 유지
+            try:
+                f = self._files.get(sid)
+                if f is None:
+                    path = _journal_path(sid)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    f = self._files[sid] = path.open("ab")
+                    if f.tell() and _last_byte(path) != b"\n":
+                        f.write(b"\n")  # 잘린 마지막 줄 뒤에 이어 쓰지 않도록
+                f.write(line)
+                f.flush()
+            except Exception as e:  # 한 줄의 실패로 writer 스레드가 죽으면 모든 세션의 저장이 멈춤
+                print(f"[DEBUG] Entry journal write failed: {sid}: {type(e).__name__}: {e}")
+        self._files.clear()  # popitem → 남은 핸들 close
+
+    def close(self):
+        """서버 shutdown에서 호출: 큐에 남은 줄까지 쓰고 writer 스레드 종료 (블로킹)"""
+        if self._writer is not None:
+            self._journal_q.put(_STOP)
+            self._writer.join(timeout=5)
+            self._writer = None
 
     def start(self, sid: str):
-        if sid not in self.store:
+        if sid not in self.store and not self._load(sid):
             self.store[sid] = {
                 "created_at": datetime.utcnow().isoformat(),
-                "entries": []  # list of {"t0","t1","text_en","text_ko"}
+                **_new_columns(),
             }
 
     def append(self, sid: str, t0: float, t1: float, text_en: str, text_ko: str):
         self.start(sid)
-        self.store[sid]["entries"].append({
-            "t0": t0, "t1": t1,
-            "text_en": text_en, "text_ko": text_ko
-        })
+        cols = self.store[sid]
+        cols["t0"].append(t0)
+        cols["t1"].append(t1)
+        cols["text_en"].append(text_en)
+        cols["text_ko"].append(text_ko)
+
+        b_txt, b_srt = _blocks(len(cols["text_en"]), t0, t1, text_en, text_ko)
+        self._txt_blocks.setdefault(sid, []).append(b_txt)
+        self._srt_blocks.setdefault(sid, []).append(b_srt)
+        self._journal(sid, t0, t1, text_en, text_ko)
 
     def get(self, sid: str) -> Dict[str, Any]:
-        return self.store.get(sid, {"entries": []})
+        cols = self.store.get(sid)
+        if cols is None and self._load(sid):
+            cols = self.store[sid]
+        return cols or _new_columns()
 
     def end(self, sid: str):
-        # 필요시 후처리/정렬
-        pass
+        # JSONL 핸들만 닫음 (writer 스레드에서, 앞서 넣은 줄을 다 쓴 뒤. 다시 append하면 다시 열림)
+        if self._writer is not None:
+            self._journal_q.put((sid, None))
+
+    def _join(self, sid: str, kind: str, blocks: Dict[str, List[str]]) -> str:
+        bl = blocks.get(sid)
+        if bl is None and sid not in self.store and self._load(sid):
+            bl = blocks.get(sid)
+        if not bl:
+            return ""
+        key = (sid, kind)
+        n = len(bl)
+        hit = self._joined.get(key)
+        if hit is not None and hit[0] == n:
+            return hit[1]
+        out = "\n\n".join(bl[:n]).strip()
+        self._joined[key] = (n, out)
+        return out
 
     def to_txt(self, sid: str) -> str:
-        data = self.get(sid)
-        lines = []
-        for i, e in enumerate(data["entries"], 1):
-            lines.append(f"[{i}] ({e['t0']:.2f}–{e['t1']:.2f}s)")
-            lines.append(f"EN: {e['text_en']}")
-            if e["text_ko"]:
-                lines.append(f"KO: {e['text_ko']}")
-            lines.append("")
-        return "\n".join(lines).strip()
+        # 새 entry가 없으면 직전 결과를 그대로 반환 (폴링 O(1))
+        return self._join(sid, "txt", self._txt_blocks)
 
     def to_srt(self, sid: str) -> str:
         # 선택 기능: 자막 파일 필요 시 사용
-        def fmt(t):
-            # 12.34 -> 00:00:12,340
-            h = int(t // 3600); m = int((t % 3600) // 60); s = int(t % 60); ms = int((t - int(t)) * 1000)
-            return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-        data = self.get(sid)
-        lines = []
-        for i, e in enumerate(data["entries"], 1):
-            lines.append(str(i))
-            lines.append(f"{fmt(e['t0'])} --> {fmt(e['t1'])}")
-            lines.append(e["text_en"])
-            if e["text_ko"]:
-                lines.append(e["text_ko"])
-            lines.append("")
-        return "\n".join(lines).strip()
+        return self._join(sid, "srt", self._srt_blocks)
 
 SESSION = SessionStore()
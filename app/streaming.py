@@ -0,0 +1,122 @@
+# app/streaming.py
+# 롤링 오디오 버퍼 + LocalAgreement-2 (Whisper-Streaming 방식)
+# - 매 청크마다 버퍼 전체(최대 30초)를 다시 전사하고, 직전 가설과 일치하는 접두부만 확정
+# - 확정 구간이 충분히 쌓이면 그 지점에서 오디오를 잘라내고, 잘린 확정 텍스트는 prompt로 사용
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+class Word(NamedTuple):
+    start: float  # 세션 기준 절대 시간(초)
+    end: float
+    text: str
+
+def _norm(w: str) -> str:
+    return w.strip().lower().strip(".,!?;:\"'")
+
+def words_to_text(words: List[Word]) -> str:
+    return " ".join(w.text.strip() for w in words if w.text.strip())
+
+class LocalAgreement:
+    """LocalAgreement-2: 연속된 두 가설(hypothesis)에서 모두 나온 접두부만 확정"""
+
+    def __init__(self):
+        self.last_committed_time = 0.0
+        self.committed_in_buffer: List[Word] = []  # 오디오 버퍼 안에 남아있는 확정 단어
+        self.prev: List[Word] = []  # 직전 가설의 미확정 꼬리
+        self.new: List[Word] = []
+
+    def insert(self, words: List[Word]):
+        # 이미 확정된 시점 이전 단어는 버림 (경계 오차 0.1s 허용)
+        new = [w for w in words if w.start > self.last_committed_time - 0.1]
+        # 확정 경계 근처(1s 이내)에서 확정 꼬리와 겹치는 n-gram(1..5) 제거
+        if new and self.committed_in_buffer and abs(new[0].start - self.last_committed_time) < 1.0:
+            for n in range(min(len(self.committed_in_buffer), len(new), 5), 0, -1):
+                tail = [_norm(w.text) for w in self.committed_in_buffer[-n:]]
+                head = [_norm(w.text) for w in new[:n]]
+                if tail == head:
+                    new = new[n:]
+                    break
+        self.new = new
+
+    def flush(self) -> List[Word]:
+        """직전 가설과 현재 가설의 최장 공통 접두부를 확정하고 반환"""
+        commit: List[Word] = []
+        i = 0
+        while i < len(self.new) and i < len(self.prev) and _norm(self.new[i].text) == _norm(self.prev[i].text):
+            commit.append(self.new[i])
+            i += 1
+        if commit:
+            self.last_committed_time = commit[-1].end
+        self.prev = self.new[i:]
+        self.new = []
+        self.committed_in_buffer.extend(commit)
+        return commit
+
+    def pop_committed(self, t: float):
+        self.committed_in_buffer = [w for w in self.committed_in_buffer if w.end > t]
+
+    @property
+    def tentative(self) -> List[Word]:
+        return self.prev
+
+class RollingTranscriber:
+    """
+    transcribe_fn(samples, prompt) -> {"words": [{"start","end","word"}], ...}
+    (버퍼 상대 시간). feed()는 블로킹이므로 스레드에서 호출.
+    """
+
+    def __init__(
+        self,
+        transcribe_fn: Callable[..., Dict[str, Any]],
+        *,
+        max_sec: float = 30.0,
+        trim_sec: float = 10.0,
+        prompt_chars: int = 200,
+    ):
+        self.transcribe_fn = transcribe_fn
+        self.max_sec = max_sec
+        self.trim_sec = trim_sec
+        self.prompt_chars = prompt_chars
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0  # 버퍼 첫 샘플의 절대 시간
+        self.agree = LocalAgreement()
+        self.prompt = ""  # 버퍼 밖으로 밀려난 확정 텍스트(꼬리)
+
+    def feed(self, samples: np.ndarray, *, speech: bool = True) -> Tuple[List[Word], List[Word]]:
+        """
+        새 오디오를 붙이고 재전사 → (이번에 확정된 단어, 미확정 꼬리)
+        speech=False(VAD 무음)이고 확정 대기 중인 꼬리도 없으면 버퍼 전체 재전사를 생략
+        """
+        self.audio = np.concatenate([self.audio, samples.astype(np.float32, copy=False)])
+        if not speech and not self.agree.tentative:
+            self._trim()
+            return [], []
+        res = self.transcribe_fn(self.audio, prompt=self.prompt)
+        self.agree.insert([
+            Word(self.offset + w["start"], self.offset + w["end"], w["word"])
+            for w in res.get("words") or []
+        ])
+        committed = self.agree.flush()
+        self._trim()
+        return committed, self.agree.tentative
+
+    def _trim(self):
+        dur = len(self.audio) / SAMPLE_RATE
+        t = self.agree.last_committed_time
+        if t - self.offset >= self.trim_sec:
+            # 확정 구간이 충분히 길면 마지막 확정 단어 끝에서 잘라냄
+            cut_t = t
+        elif dur > self.max_sec:
+            # 확정이 안 되는 경우에도 버퍼는 max_sec로 제한
+            cut_t = self.offset + dur - self.max_sec
+        else:
+            return
+        done = [w for w in self.agree.committed_in_buffer if w.end <= cut_t]
+        if done:
+            self.prompt = (self.prompt + " " + words_to_text(done)).strip()[-self.prompt_chars:]
+        self.agree.pop_committed(cut_t)
+        self.audio = self.audio[int((cut_t - self.offset) * SAMPLE_RATE):]
+        self.offset = cut_t
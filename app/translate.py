@@ -1,7 +1,20 @@
+import asyncio
 import os
-from openai import OpenAI
+import re
+from typing import List
 
-_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import httpx
+from openai import AsyncOpenAI
+
+# 이벤트 루프에서 바로 await (스레드 풀 없이 동시 요청 다중화)
+_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    ),
+)
 _LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
 _SYSTEM = (
@@ -9,10 +22,20 @@ _SYSTEM = (
     "Translate concisely and naturally into polite Korean."
 )
 
-def translate_text(english_text: str) -> str:
+# 캐시 키에 포함 → 모델/프롬프트를 바꾸면 기존 번역 캐시가 자동으로 무효화
+CACHE_NAMESPACE = f"{_LLM_MODEL}\0{_SYSTEM}"
+
+_SEP = "%%"
+_SEP_RE = re.compile(r"^\s*%%\s*$", re.MULTILINE)
+
+async def warmup():
+    """서버 startup에서 1회: 과금 없는 models.retrieve로 HTTP/2 커넥션(TLS)을 미리 맺어 둠"""
+    await _client.with_options(timeout=5.0, max_retries=0).models.retrieve(_LLM_MODEL)
+
+async def translate_text(english_text: str) -> str:
     if not english_text:
         return ""
-    resp = _client.chat.completions.create(
+    resp = await _client.chat.completions.create(
         model=_LLM_MODEL,
         messages=[
             {"role": "system", "content": _SYSTEM},
@@ -20,4 +43,37 @@ def translate_text(english_text: str) -> str:
         ],
         temperature=0.2,
     )
-    return (resp.choices[0].message.content or "").strip()
\ No newline at end of file
+    return (resp.choices[0].message.content or "").strip()
+
+async def translate_texts(english_texts: List[str]) -> List[str]:
+    """
+    여러 창을 chat.completions 1회로 번역 (번역문은 %% 줄로 구분).
+    응답 개수가 안 맞으면 항목별 translate_text(동시 실행)로 대체.
+    """
+    idx = [i for i, t in enumerate(english_texts) if t]
+    out = [""] * len(english_texts)
+    if len(idx) <= 1:
+        for i in idx:
+            out[i] = await translate_text(english_texts[i])
+        return out
+
+    numbered = "\n".join(f"{n}) {english_texts[i]}" for n, i in enumerate(idx, 1))
+    resp = await _client.chat.completions.create(
+        model=_LLM_MODEL,
+        messages=[
+            {"role": "system", "content": _SYSTEM},
+            {"role": "user", "content": (
+                f"Translate each numbered item into Korean. Output exactly {len(idx)} translations "
+                f"in the same order, without numbers, separated by a line containing only {_SEP}:\n{numbered}"
+            )}
+        ],
+        temperature=0.2,
+    )
+    parts = [p.strip() for p in _SEP_RE.split(resp.choices[0].message.content or "")]
+    parts = [p for p in parts if p]
+    if len(parts) != len(idx):
+        print(f"[DEBUG] Batch translate count mismatch: {len(parts)} != {len(idx)}, falling back")
+        parts = await asyncio.gather(*[translate_text(english_texts[i]) for i in idx])
+    for i, ko in zip(idx, parts):
+        out[i] = ko
+    return out
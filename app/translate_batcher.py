@@ -0,0 +1,131 @@
+# app/translate_batcher.py
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.cache import get_cached, set_cached, text_hash
+from app.translate import translate_text, translate_texts
+
+MAX_BATCH = 10            # 한 요청에 묶을 최대 창(window) 수
+MAX_BATCH_CHARS = 5000   # 모은 원문 길이가 이만큼 되면 바로 전송 (응답 길이/분할 실패 위험 제한)
+BATCH_WINDOW_SEC = 0.15   # 첫 창 도착 후 추가 창을 모으는 시간
+
+_Item = Tuple[str, asyncio.Future]
+
+_queue: Optional[asyncio.Queue] = None
+_consumer: Optional[asyncio.Task] = None
+_inflight: Set[asyncio.Task] = set()  # 진행 중 배치 (GC 방지용 참조)
+_pending: Dict[bytes, asyncio.Future] = {}  # text hash -> 진행 중 조회/번역 (같은 원문 동시 요청은 LLM 호출 1번)
+_cache_writes: Set[asyncio.Task] = set()  # 캐시 write-through (응답 경로 밖, GC 방지용 참조)
+
+def _fail(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_exception(RuntimeError("translate batcher stopped"))
+
+async def _run_batch(batch: List[_Item]):
+    try:
+        res = await translate_texts([text for text, _ in batch])
+    except asyncio.CancelledError:
+        for _, fut in batch:
+            _fail(fut)  # stop()에서 취소 → enqueue를 기다리던 호출자가 멈추지 않도록
+        raise
+    except Exception as e:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(e)
+    else:
+        for (_, fut), ko in zip(batch, res):
+            if not fut.done():
+                fut.set_result(ko)
+
+async def _consume(q: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        batch: List[_Item] = [await q.get()]
+        n_chars = len(batch[0][0])
+        deadline = loop.time() + BATCH_WINDOW_SEC
+        try:
+            while len(batch) < MAX_BATCH and n_chars < MAX_BATCH_CHARS:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_chars += len(item[0])
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                _fail(fut)  # 모으던 중 stop() → 큐에서 이미 꺼낸 창도 실패 처리
+            raise
+        # 번역은 수 초 걸리므로 기다리지 않고 다음 배치를 계속 모음
+        task = asyncio.create_task(_run_batch(batch))
+        _inflight.add(task)
+        task.add_done_callback(_inflight.discard)
+
+def start():
+    """FastAPI startup에서 호출: 프로세스 공용 consumer task 기동"""
+    global _queue, _consumer
+    if _consumer is not None:
+        return
+    _queue = asyncio.Queue()
+    _consumer = asyncio.create_task(_consume(_queue))
+
+async def stop():
+    global _queue, _consumer
+    if _consumer is None:
+        return
+    _consumer.cancel()
+    for task in list(_inflight):
+        task.cancel()
+    await asyncio.gather(_consumer, *_inflight, return_exceptions=True)
+    # 아직 배치로 묶이지 않은 창도 실패 처리
+    while not _queue.empty():
+        _fail(_queue.get_nowait()[1])
+    _queue, _consumer = None, None
+
+async def _lookup_or_translate(h: bytes, english_text: str) -> str:
+    hit = await get_cached(h, "ko")
+    if hit is not None:
+        return hit
+    if _queue is None:
+        text_ko = await translate_text(english_text)
+    else:
+        fut = asyncio.get_running_loop().create_future()
+        await _queue.put((english_text, fut))
+        text_ko = await fut
+    if text_ko:
+        # Redis/SQLite 쓰기는 기다리지 않음 → ko_batch 전송이 캐시 쓰기 지연을 떠안지 않도록
+        task = asyncio.create_task(set_cached(h, "ko", text_ko))
+        _cache_writes.add(task)
+        task.add_done_callback(_cache_writes.discard)
+    return text_ko
+
+async def enqueue(english_text: str) -> str:
+    """
+    창 하나를 배치 큐에 넣고 자기 번역 결과만 기다린다. 캐시 적중 시 큐를 거치지 않음.
+    같은 원문이 이미 조회/번역 중이면 그 결과를 함께 기다림.
+    consumer가 없으면(스크립트 실행 등) 바로 단건 번역.
+    """
+    if not english_text:
+        return ""
+    h = text_hash(english_text)
+    shared = _pending.get(h)
+    if shared is not None:
+        return await asyncio.shield(shared)  # 기다리던 쪽이 취소돼도 공유 결과는 유지
+
+    fut = _pending[h] = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())  # 대기자가 없을 때 경고 방지
+    try:
+        text_ko = await _lookup_or_translate(h, english_text)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(text_ko)
+        return text_ko
+    finally:
+        del _pending[h]
@@ -68,6 +68,28 @@ async function apiPostForm<T>(path: string, form: FormData): Promise<T> {
   }
 }
 
+async function apiPostFormBlob(path: string, form: FormData): Promise<Blob> {
+  const url = new URL(path, API_BASE_URL);
+  try {
+    const res = await fetch(url.toString(), { method: "POST", body: form, credentials: "omit" });
+    if (!res.ok) {
+      const errorText = await res.text();
+      try {
+        const errorJson = JSON.parse(errorText);
+        throw new Error(errorJson.reason || errorJson.message || `HTTP ${res.status}`);
+      } catch {
+        throw new Error(errorText || `HTTP ${res.status}`);
+      }
+    }
+    return res.blob();
+  } catch (error) {
+    if (error instanceof TypeError && error.message.includes("fetch")) {
+      throw new Error("Network error: Failed to connect to server");
+    }
+    throw error;
+  }
+}
+
 /** ---------- Types ---------- */
 type ConfirmedLine = { t0: number; t1: number; en: string; ko: string };
 
@@ -292,6 +314,16 @@ export default function RecorderApp() {
         console.warn("[SSE] Failed to parse ko_batch:", e.data, err);
       }
     });
+    // /chunk는 202로 먼저 응답하므로 ASR 실패는 SSE로 도착 (청크 하나만 건너뜀)
+    ev.addEventListener("chunk_error", (e: MessageEvent) => {
+      try {
+        const data = JSON.parse(e.data);
+        console.warn("Non-fatal chunk rejected:", data?.status, data?.reason);
+        setStatusMsg("Skipped a bad chunk");
+      } catch (err) {
+        console.warn("[SSE] Failed to parse chunk_error:", e.data, err);
+      }
+    });
     ev.onerror = (event) => {
       console.error("[SSE] Error:", event);
       setStatusMsg("SSE connection error");
@@ -333,7 +365,7 @@ export default function RecorderApp() {
         .catch((err: any) => {
           const msg = String(err?.message || "");
           console.warn("Chunk upload error:", msg);
-          if (msg.includes("ASR error:") || msg.includes("415") || msg.includes("skipped")) {
+          if (msg.includes("ASR error:") || msg.includes("415") || msg.includes("skipped") || msg.includes("too many pending")) {
             console.warn("Non-fatal chunk rejected:", msg);
             setStatusMsg("Skipped a bad chunk");
           } else {
@@ -503,9 +535,12 @@ export default function RecorderApp() {
     try {
       const form = new FormData();
       form.append("session_id", sid);
-      const data = await apiPostForm<{ download_url: string }>("/export", form);
-      const absolute = new URL(data.download_url, API_BASE_URL).toString();
-      setDownloadUrl(absolute);
+      // 서버가 파일을 바로 스트리밍 → 별도 /download 왕복 없이 blob URL로 저장
+      const blob = await apiPostFormBlob("/export", form);
+      setDownloadUrl((prev) => {
+        if (prev) URL.revokeObjectURL(prev);
+        return URL.createObjectURL(blob);
+      });
       setStatusMsg("Export ready — download available");
     } catch (err: any) {
       setErrorMsg(err?.message || "Export failed");
@@ -596,7 +631,7 @@ export default function RecorderApp() {
             {downloadUrl && (
               <a
                 href={downloadUrl}
-                download
+                download="transcript.docx"
                 className="inline-flex items-center px-4 py-2 rounded-md bg-black text-white text-sm font-medium"
               >
                 <Download className="mr-2 h-4 w-4" /> Download Word file
@@ -3,51 +3,70 @@
 
 import asyncio
 import argparse
+import struct
 import wave
-from io import BytesIO
 import websockets
 
+from app.frames import unpack_frames
+
 DEFAULT_WS_URL = "ws://localhost:8080/ws/stream"
 
-def make_wav_chunk_bytes(frames: bytes, rate: int, channels: int, sampwidth: int) -> bytes:
-    """주어진 PCM 프레임으로 '헤더 포함' WAV 바이트 생성"""
-    buf = BytesIO()
-    with wave.open(buf, "wb") as w:
-        w.setnchannels(channels)
-        w.setsampwidth(sampwidth)
-        w.setframerate(rate)
-        w.writeframes(frames)
-    return buf.getvalue()
-
-async def send_wav_in_chunks(path: str, ws_url: str, session_id: str, chunk_sec: float):
-    url = f"{ws_url}?session_id={session_id}"
-    async with websockets.connect(url, max_size=16 * 1024 * 1024) as ws:
-        with wave.open(path, "rb") as w:
-            rate = w.getframerate()
-            channels = w.getnchannels()
-            sampwidth = w.getsampwidth()
-            total_frames = w.getnframes()
-            frames_per_chunk = int(rate * chunk_sec)
-
-            if channels != 1:
-                print(f"[warn] 이 파일은 mono(1채널)가 아닙니다 (channels={channels}). "
-                      f"권장 변환: ffmpeg -i {path} -ac 1 -ar 16000 out.wav")
-
-            idx = 0
+_RIFF = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+def wav_header(n_bytes: int, rate: int, channels: int, sampwidth: int) -> bytes:
+    """PCM 바이트 수에 맞는 44바이트 WAV 헤더 (wave.Wave_write/BytesIO 왕복 없이 struct 한 번)"""
+    block = channels * sampwidth
+    return _RIFF.pack(
+        b"RIFF", 36 + n_bytes, b"WAVE", b"fmt ", 16, 1, channels,
+        rate, rate * block, block, sampwidth * 8, b"data", n_bytes,
+    )
+
+async def _drain(ws):
+    """서버 메시지를 송신과 별도로 계속 수신/출력 (연결이 닫히면 종료)"""
+    idx = 0
+    try:
+        async for msg in ws:
+            idx += 1
+            if isinstance(msg, bytes):  # proto=bin
+                msg = unpack_frames(msg)
+            print(f"[{idx}] SERVER:", msg)
+    except websockets.ConnectionClosed:
+        pass
+
+async def send_wav_in_chunks(path: str, ws_url: str, session_id: str, chunk_sec: float, proto: str = "json",
+                             realtime: bool = False):
+    with wave.open(path, "rb") as w:
+        rate = w.getframerate()
+        channels = w.getnchannels()
+        sampwidth = w.getsampwidth()
+        total_frames = w.getnframes()
+        frames_per_chunk = int(rate * chunk_sec)
+
+        if channels != 1:
+            print(f"[warn] 이 파일은 mono(1채널)가 아닙니다 (channels={channels}). "
+                  f"권장 변환: ffmpeg -i {path} -ac 1 -ar 16000 out.wav")
+
+        # 16kHz mono Int16이면 서버가 받는 raw PCM 그대로 전송 (format=pcm16 → 헤더/디코드 모두 생략)
+        raw_pcm = (rate, channels, sampwidth) == (16000, 1, 2)
+        url = f"{ws_url}?session_id={session_id}&proto={proto}" + ("&format=pcm16" if raw_pcm else "")
+        async with websockets.connect(url, max_size=16 * 1024 * 1024) as ws:
+            # 송신/수신 분리: 다음 청크 전송이 서버 처리와 겹치므로 실제 서버 처리량이 드러남
+            recv_task = asyncio.create_task(_drain(ws))
+
             sent = 0
             while sent < total_frames:
                 to_read = min(frames_per_chunk, total_frames - sent)
                 frames = w.readframes(to_read)
                 sent += to_read
-                idx += 1
 
-                # 각 청크를 '헤더 포함 WAV'로 만들어 전송
-                chunk_bytes = make_wav_chunk_bytes(frames, rate, channels, sampwidth)
-                await ws.send(chunk_bytes)
+                # raw PCM이 아니면 각 청크를 '헤더 포함 WAV'로 만들어 전송
+                await ws.send(frames if raw_pcm else wav_header(len(frames), rate, channels, sampwidth) + frames)
+                if realtime:
+                    await asyncio.sleep(to_read / rate)
 
-                # 서버 응답 수신(영문/한글 자막 JSON)
-                msg = await ws.recv()
-                print(f"[{idx}] SERVER:", msg)
+            # 전송 끝 알림 → 서버가 남은 청크 ASR과 마지막 배치 번역(ko_batch)까지 보낸 뒤 연결을 닫음
+            await ws.send("eos")
+            await recv_task
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -55,6 +74,10 @@ if __name__ == "__main__":
     ap.add_argument("--ws-url", default=DEFAULT_WS_URL, help="WebSocket 엔드포인트 기본 주소")
     ap.add_argument("--session-id", default="demo-1", help="세션 ID (export 시 사용)")
     ap.add_argument("--chunk-sec", type=float, default=3.0, help="청크 길이(초). 2.0~3.0 권장")
+    ap.add_argument("--proto", default="json", choices=["json", "bin"], help="서버 응답 프레임 형식")
+    ap.add_argument("--realtime", action="store_true",
+                    help="청크 길이만큼 쉬면서 전송 (기본은 연속 전송. WAV 컨테이너 청크는 서버 backlog 상한에서 버려질 수 있음)")
     args = ap.parse_args()
 
-    asyncio.run(send_wav_in_chunks(args.wav_path, args.ws_url, args.session_id, args.chunk_sec))
+    asyncio.run(send_wav_in_chunks(args.wav_path, args.ws_url, args.session_id, args.chunk_sec, args.proto,
+                                   args.realtime))